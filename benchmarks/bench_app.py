@@ -0,0 +1,223 @@
+"""Headless benchmarks of the IPyTerm app
+
+Run with:
+
+    python -m benchmarks.bench_app [--devices N] [--vectors N] [--members N] [--rates R R ..]
+                                   [--blobsize N] [--blobconnection]
+
+from the repository root.
+
+Starts a benchmarks.fakeserver.FakeServer, and drives IPyTerm with the Textual pilot,
+with no terminal output. Reports:
+
+The time taken to open a device screen, for a new screen and for a cached one.
+
+The latency from the server sending a value to it being set on its member widget,
+measured on the 'stamp' vector of device0, which is shown while set vectors
+are sent at each rate.
+
+The events per second received at each rate, and the highest rate sustained, that is,
+with the server able to send at that rate, nearly every event handled, and the
+latency below --maxlatency.
+
+The resident memory at each stage, and after repeatedly opening and closing devices.
+
+If --blobsize is given, BLOBs of that size are received into a temporary folder while the
+rates are measured, and with --blobconnection they are received on a second connection."""
+
+
+import sys, asyncio, argparse, time, statistics, tempfile
+
+from indipyterm import IPyTerm
+
+from .fakeserver import FakeServer
+
+
+def _memory():
+    "Return the resident memory of this process in MiB, or None if unknown"
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        import resource
+        return pages * resource.getpagesize() / 1048576
+    except (OSError, ImportError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return
+    # the peak rather than current memory, in KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return maxrss / 1048576
+    return maxrss / 1024
+
+
+def _report_memory(stage):
+    memory = _memory()
+    if memory is not None:
+        print(f"{'memory ' + stage:<34}{memory:8.1f} MiB")
+
+
+async def _wait_for(condition, timeout=30):
+    "Wait until condition() is True, return the time taken"
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("Timed out waiting for the app")
+        await asyncio.sleep(0.002)
+    return time.perf_counter() - start
+
+
+class _Latency:
+    "Records the time from sending each stamp to its value being set on the member widget"
+
+    def __init__(self, server):
+        self.server = server
+        self.latencies = []
+
+    def on_mvalue(self, value):
+        now = time.monotonic()
+        try:
+            seq = int(value)
+            sendtime = self.server.sendtimes.pop(seq)
+        except (ValueError, KeyError):
+            return
+        self.latencies.append(now - sendtime)
+        # earlier stamps may have been replaced by this one before they were drawn
+        for earlier in [s for s in self.server.sendtimes if s < seq]:
+            del self.server.sendtimes[earlier]
+
+    def reset(self):
+        self.latencies.clear()
+        self.server.sendtimes.clear()
+
+    def percentile(self, p):
+        if not self.latencies:
+            return float("nan")
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[p-1]
+
+
+def _device_button(app, devicename):
+    "Return the button on the start screen for the given device, of the only server, server0"
+    deviceid = app.itemid.get_devicid("server0", devicename)
+    return app.get_screen("startsc").query_one(f"#{deviceid}")
+
+
+async def _open_device(app, pilot, devicename):
+    "Press the device button, and return the time until its vectors are shown"
+    start = time.perf_counter()
+    _device_button(app, devicename).press()
+    await _wait_for(lambda: (getattr(app.screen, "devicename", None) == devicename) and bool(app.screen.query("VectorPane")))
+    return time.perf_counter() - start
+
+
+async def _close_device(app, pilot):
+    await pilot.press("m")
+    startsc = app.get_screen("startsc")
+    await _wait_for(lambda: app.screen is startsc)
+
+
+async def _bench(args):
+    if args.blobsize:
+        with tempfile.TemporaryDirectory() as blobfolder:
+            return await _run(args, blobfolder)
+    return await _run(args)
+
+
+async def _run(args, blobfolder=None):
+    server = FakeServer("127.0.0.1", 0, args.devices, args.vectors, args.members, rate=0, blobsize=args.blobsize or 5)
+    port = await server.start()
+    _report_memory("before start")
+    app = IPyTerm(host="127.0.0.1", port=port, blobfolder=blobfolder, framerate=args.framerate, blobconnection=args.blobconnection,
+                  cache=False)
+    async with app.run_test(size=(120, 50), notifications=False) as pilot:
+        # wait for every device button
+        seconds = await _wait_for(lambda: len(app.get_screen("startsc").query(".devices")) == args.devices)
+        print(f"{'definitions received and shown':<34}{seconds:8.3f} s")
+        _report_memory("after definitions")
+
+        # device screen open times
+        for devicename in [f"device{d}" for d in range(args.devices)][:args.cycles]:
+            seconds = await _open_device(app, pilot, devicename)
+            print(f"{'open ' + devicename + ' new screen':<34}{seconds:8.3f} s")
+            await pilot.pause(0.1)
+            await _close_device(app, pilot)
+        seconds = await _open_device(app, pilot, "device0")
+        print(f"{'open device0 cached screen':<34}{seconds:8.3f} s")
+        _report_memory("after opening devices")
+
+        # show the stamp vector of device0
+        app.screen.query_one("TabbedContent").active = app.itemid.get_group_id("Stamp")
+        await _wait_for(lambda: app.registry.get_pane("server0", "device0", "stamp", "seq") is not None)
+        latency = _Latency(server)
+        app.screen.watch(app.registry.get_pane("server0", "device0", "stamp", "seq"), "mvalue", latency.on_mvalue, init=False)
+
+        print()
+        print(f"{'rate':>8}{'events/s':>12}{'latency p50':>14}{'p95':>10}{'max':>10}")
+        sustained = 0
+        for rate in args.rates:
+            server.rate = rate
+            # let the rate settle
+            await asyncio.sleep(0.5)
+            latency.reset()
+            startcount = app.eventstats.total
+            startsent = server.sent
+            start = time.perf_counter()
+            while time.perf_counter() - start < args.duration:
+                server.sendstamp("device0")
+                await asyncio.sleep(0.05)
+            duration = time.perf_counter() - start
+            received = (app.eventstats.total - startcount) / duration
+            # includes the stamps, and is less than the rate if the server is held up by the client
+            sent = (server.sent - startsent) / duration
+            # allow the last stamps to arrive
+            await asyncio.sleep(min(1.0, args.maxlatency))
+            p50 = latency.percentile(50)
+            p95 = latency.percentile(95)
+            worst = max(latency.latencies, default=float("nan"))
+            print(f"{rate:8d}{received:12.0f}{p50*1000:11.1f} ms{p95*1000:7.1f} ms{worst*1000:7.1f} ms")
+            # stamps which never arrived are left in server.sendtimes
+            if (sent >= 0.95 * rate) and (received >= 0.95 * sent) and (p95 <= args.maxlatency) and not server.sendtimes:
+                sustained = rate
+            else:
+                break
+        server.rate = 0
+        print(f"highest rate sustained {sustained} events/s")
+        print()
+        _report_memory("after rates")
+
+        # open and close the devices repeatedly, the memory should not grow
+        await _close_device(app, pilot)
+        for cycle in range(args.cycles):
+            for d in range(args.devices):
+                await _open_device(app, pilot, f"device{d}")
+                await _close_device(app, pilot)
+        _report_memory(f"after {args.cycles} open/close cycles")
+
+        await app.action_quit()
+    await server.stop()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the IPyTerm app.")
+    parser.add_argument("--devices", type=int, default=4, help="Number of devices (default 4).")
+    parser.add_argument("--vectors", type=int, default=40, help="Number of vectors per device (default 40).")
+    parser.add_argument("--members", type=int, default=4, help="Number of members per vector (default 4).")
+    parser.add_argument("--rates", type=int, nargs="+", default=[100, 200, 500, 1000, 2000, 5000],
+                        help="Set vectors per second sent by the server, in increasing order (default 100 200 500 1000 2000 5000).")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds to run at each rate (default 3).")
+    parser.add_argument("--maxlatency", type=float, default=0.5, help="Highest p95 latency in seconds for a rate to be sustained (default 0.5).")
+    parser.add_argument("--framerate", type=int, default=20, help="Framerate of the app (default 20).")
+    parser.add_argument("--cycles", type=int, default=4, help="Number of device open/close cycles (default 4).")
+    parser.add_argument("--blobsize", type=int, default=0, help="Bytes in each BLOB member received, 0 for no BLOBs (default 0).")
+    parser.add_argument("--blobconnection", action="store_true", help="Receive BLOBs on a second connection.")
+    args = parser.parse_args()
+    return asyncio.run(_bench(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
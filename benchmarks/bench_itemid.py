@@ -0,0 +1,93 @@
+"""Microbenchmarks of indipyterm.iclient.ItemID
+
+Run with:
+
+    python -m benchmarks.bench_itemid [--devices N] [--vectors N] [--members N]
+
+from the repository root.
+
+Times setting, getting and reverse mapping ids, and clearing devices, then repeatedly
+adds and clears devices to check the size of the index stays flat."""
+
+
+import sys, argparse, timeit, tracemalloc
+
+from indipyterm.iclient import ItemID
+
+
+class _Device:
+    "Stands in for an indipyclient device, clear_device only needs its devicename"
+
+    def __init__(self, devicename):
+        self.devicename = devicename
+
+
+def _populate(itemid, devices, vectors, members):
+    "Set ids for every device, group, vector and member, return the device ids"
+    deviceids = []
+    for d in range(devices):
+        devicename = f"device{d}"
+        deviceids.append(itemid.set_devicid("server0", devicename))
+        itemid.set_device("server0", devicename)
+        for v in range(vectors):
+            vectorname = f"vector{v}"
+            itemid.set_group_id(f"group{v%10}")
+            itemid.set_id(vectorname)
+            for m in range(members):
+                itemid.set_id(vectorname, f"member{m}")
+    itemid.set_device()
+    return deviceids
+
+
+def _report(name, seconds, operations):
+    print(f"{name:<28}{seconds*1e9/operations:10.1f} ns/op  ({operations} ops)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of ItemID.")
+    parser.add_argument("--devices", type=int, default=10, help="Number of devices (default 10).")
+    parser.add_argument("--vectors", type=int, default=500, help="Number of vectors per device (default 500).")
+    parser.add_argument("--members", type=int, default=4, help="Number of members per vector (default 4).")
+    parser.add_argument("--cycles", type=int, default=50, help="Number of add/clear cycles (default 50).")
+    args = parser.parse_args()
+
+    items = args.devices * args.vectors * (args.members + 1)
+
+    itemid = ItemID()
+    seconds = timeit.timeit(lambda: _populate(itemid, args.devices, args.vectors, args.members), number=1)
+    _report("set_id", seconds, items)
+
+    # getting ids of the members of one device
+    itemid.set_device("server0", "device0")
+    keys = [(f"vector{v}", f"member{m}") for v in range(args.vectors) for m in range(args.members)]
+    seconds = timeit.timeit(lambda: [itemid.get_id(v, m) for v, m in keys], number=10)
+    _report("get_id", seconds, 10*len(keys))
+    itemid.set_device()
+
+    # reverse mapping of device button ids, the last device is the worst case for a linear scan
+    deviceids = [itemid.get_devicid("server0", f"device{d}") for d in range(args.devices)]
+    seconds = timeit.timeit(lambda: itemid.get_device(deviceids[-1]), number=10000)
+    _report("get_device", seconds, 10000)
+
+    seconds = timeit.timeit(lambda: [itemid.clear_device("server0", _Device(f"device{d}")) for d in range(args.devices)], number=1)
+    _report("clear_device", seconds, args.devices)
+    if itemid:
+        print("Error: ids remain after every device is cleared")
+        return 1
+
+    # repeatedly add and clear devices, the memory used should not grow
+    tracemalloc.start()
+    for cycle in range(args.cycles):
+        _populate(itemid, args.devices, args.vectors, args.members)
+        for d in range(args.devices):
+            itemid.clear_device("server0", _Device(f"device{d}"))
+        if cycle == 0:
+            firstsize, _ = tracemalloc.get_traced_memory()
+    lastsize, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory after first cycle {firstsize/1024:.1f} KiB, after {args.cycles} cycles {lastsize/1024:.1f} KiB, peak {peak/1024:.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""A local stand-in for an INDI server, used by the benchmarks
+
+It defines a number of devices, each with a number of vectors of every type, and
+once a client has asked for properties, sends set vectors at a given rate.
+
+Run with:
+
+    python -m benchmarks.fakeserver [--port PORT] [--devices N] [--vectors N] [--members N] [--rate N] [--blobsize N]
+
+from the repository root, then connect indipyterm to it to view the devices.
+
+Every device has a text vector 'stamp', in group 'Stamp', whose member 'seq' is set
+to an increasing sequence number, and FakeServer.sendtimes records the time.monotonic()
+at which each sequence number was sent, so a client in the same process can measure
+the time from sending a value to displaying it."""
+
+
+import sys, asyncio, argparse, base64, random, time
+
+
+# The vector types, cycled through for the vectors of each device
+VECTORTYPES = ("Number", "Switch", "Text", "Light", "BLOB")
+
+
+def blobdata(size):
+    "Return size bytes, base64 encoded"
+    data = (b"BLOB\n" * (size // 5 + 1))[:size]
+    return base64.b64encode(data).decode()
+
+
+def _vectorname(vectortype, v):
+    return f"{vectortype.lower()}{v}"
+
+
+def defvectors(devicename, vectors, members):
+    "Return a list of def vector xml strings for the given device"
+    xmldata = []
+    for v in range(vectors):
+        vectortype = VECTORTYPES[v % len(VECTORTYPES)]
+        vectorname = _vectorname(vectortype, v)
+        attribs = f'device="{devicename}" name="{vectorname}" label="{vectortype} {v}" group="Group{v%4}" state="Idle"'
+        if vectortype == "Number":
+            mems = "".join(f'<defNumber name="m{m}" label="Number {m}" format="%8.3f" min="0" max="100" step="0">{m}</defNumber>' for m in range(members))
+            xmldata.append(f'<defNumberVector {attribs} perm="rw">{mems}</defNumberVector>')
+        elif vectortype == "Switch":
+            # alternate between the switch rules
+            rule = ("OneOfMany", "AnyOfMany", "AtMostOne")[(v//len(VECTORTYPES)) % 3]
+            mems = "".join(f'<defSwitch name="m{m}" label="Switch {m}">{"On" if m == 0 else "Off"}</defSwitch>' for m in range(members))
+            xmldata.append(f'<defSwitchVector {attribs} perm="rw" rule="{rule}">{mems}</defSwitchVector>')
+        elif vectortype == "Text":
+            mems = "".join(f'<defText name="m{m}" label="Text {m}">text {m}</defText>' for m in range(members))
+            xmldata.append(f'<defTextVector {attribs} perm="rw">{mems}</defTextVector>')
+        elif vectortype == "Light":
+            mems = "".join(f'<defLight name="m{m}" label="Light {m}">Idle</defLight>' for m in range(members))
+            xmldata.append(f'<defLightVector {attribs}>{mems}</defLightVector>')
+        else:
+            mems = "".join(f'<defBLOB name="m{m}" label="BLOB {m}" />' for m in range(members))
+            xmldata.append(f'<defBLOBVector {attribs} perm="ro">{mems}</defBLOBVector>')
+    xmldata.append(f'<defTextVector device="{devicename}" name="stamp" label="Stamp" group="Stamp" state="Idle" perm="ro">'
+                   '<defText name="seq" label="Sequence">0</defText></defTextVector>')
+    return xmldata
+
+
+def setvector(devicename, v, members, blobs=False, blobtext=None):
+    """Return a set vector xml string with random values for vector v of the given device,
+       or None if this vector is a BLOB and blobs is False. BLOB members are set to blobtext,
+       a base64 encoded string, by default of five bytes"""
+    vectortype = VECTORTYPES[v % len(VECTORTYPES)]
+    vectorname = _vectorname(vectortype, v)
+    state = random.choice(("Idle", "Ok", "Busy", "Alert"))
+    attribs = f'device="{devicename}" name="{vectorname}" state="{state}"'
+    if vectortype == "Number":
+        mems = "".join(f'<oneNumber name="m{m}">{random.uniform(0, 100)}</oneNumber>' for m in range(members))
+    elif vectortype == "Switch":
+        on = random.randrange(members)
+        mems = "".join(f'<oneSwitch name="m{m}">{"On" if m == on else "Off"}</oneSwitch>' for m in range(members))
+    elif vectortype == "Text":
+        mems = "".join(f'<oneText name="m{m}">text {random.randrange(1000)}</oneText>' for m in range(members))
+    elif vectortype == "Light":
+        mems = "".join(f'<oneLight name="m{m}">{random.choice(("Idle", "Ok", "Busy", "Alert"))}</oneLight>' for m in range(members))
+    elif blobs:
+        if blobtext is None:
+            blobtext = blobdata(5)
+        size = len(blobtext) // 4 * 3 - blobtext[-2:].count("=")
+        mems = "".join(f'<oneBLOB name="m{m}" size="{size}" format=".txt">{blobtext}</oneBLOB>' for m in range(members))
+    else:
+        return
+    return f'<set{vectortype}Vector {attribs}>{mems}</set{vectortype}Vector>'
+
+
+class FakeServer:
+    """Serves devices named device0, device1, .. or with another prefix, each with the given number of vectors
+       and members, sending set vectors to every connected client at rate per second.
+
+       BLOBs of blobsize bytes are sent to clients which have enabled them. As a simplification,
+       the last enableBLOB value received from a client applies to all its devices and vectors,
+       so a client which sends Only receives BLOBs but no other values."""
+
+    def __init__(self, host="localhost", port=0, devices=2, vectors=20, members=4, rate=10, blobsize=5, prefix="device"):
+        self.host = host
+        self.port = port
+        self.devices = devices
+        self.vectors = vectors
+        self.members = members
+        self.rate = rate
+        self.blobtext = blobdata(blobsize)
+        # device names are this prefix followed by a number, a different prefix for
+        # each server gives unique device names when several servers are used
+        self.prefix = prefix
+        # the number of set vectors sent
+        self.sent = 0
+        # maps stamp sequence numbers to the time.monotonic() they were sent
+        self.sendtimes = {}
+        self._seq = 0
+        self._writers = set()
+        # writers of clients which have enabled BLOBs, to Also or Only
+        self._blobwriters = {}
+        self._server = None
+
+    async def start(self):
+        "Start listening, and return the port, useful if port 0 was given to pick a free port"
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in self._writers:
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def sendstamp(self, devicename=None):
+        "Send the next sequence number on the stamp vector of the given device, or the first, and return it"
+        if devicename is None:
+            devicename = f"{self.prefix}0"
+        self._seq += 1
+        self._write(f'<setTextVector device="{devicename}" name="stamp" state="Ok"><oneText name="seq">{self._seq}</oneText></setTextVector>')
+        self.sendtimes[self._seq] = time.monotonic()
+        return self._seq
+
+    def _write(self, xmldata):
+        data = xmldata.encode()
+        for writer in self._writers:
+            if self._blobwriters.get(writer) != "Only":
+                writer.write(data)
+        self.sent += 1
+
+    async def _handle(self, reader, writer):
+        "Answer getProperties with the definitions, and then send set vectors"
+        sender = None
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                if b"getProperties" in data:
+                    for d in range(self.devices):
+                        for xmldata in defvectors(f"{self.prefix}{d}", self.vectors, self.members):
+                            writer.write(xmldata.encode())
+                    await writer.drain()
+                    if sender is None:
+                        self._writers.add(writer)
+                        sender = asyncio.create_task(self._sender(writer))
+                if b"enableBLOB" in data:
+                    # the value of the last enableBLOB received
+                    value = data[data.rindex(b"<enableBLOB"):]
+                    if b">Also<" in value:
+                        self._blobwriters[writer] = "Also"
+                    elif b">Only<" in value:
+                        self._blobwriters[writer] = "Only"
+                    else:
+                        self._blobwriters.pop(writer, None)
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._blobwriters.pop(writer, None)
+            if sender is not None:
+                sender.cancel()
+            writer.close()
+
+    async def _sender(self, writer):
+        """Send set vectors at self.rate per second, in batches every 10ms so high rates
+           are not limited by the resolution of asyncio.sleep. If the client does not
+           keep up, drain will wait and the rate achieved falls below self.rate"""
+        start = time.monotonic()
+        count = 0
+        rate = self.rate
+        while True:
+            await asyncio.sleep(0.01)
+            if rate != self.rate:
+                # the rate has been changed, restart the count
+                rate = self.rate
+                start = time.monotonic()
+                count = 0
+            due = int((time.monotonic() - start) * rate)
+            while count < due:
+                v = random.randrange(self.vectors)
+                blobmode = self._blobwriters.get(writer)
+                if (blobmode == "Only") and (VECTORTYPES[v % len(VECTORTYPES)] != "BLOB"):
+                    # this client is sent BLOBs only, at the proportion of the rate they take
+                    count += 1
+                    continue
+                xmldata = setvector(f"{self.prefix}{random.randrange(self.devices)}",
+                                    v,
+                                    self.members,
+                                    blobs=blobmode is not None,
+                                    blobtext=self.blobtext)
+                if xmldata:
+                    writer.write(xmldata.encode())
+                    self.sent += 1
+                    count += 1
+            await writer.drain()
+
+
+async def _serve(args):
+    server = FakeServer(args.host, args.port, args.devices, args.vectors, args.members, args.rate, args.blobsize, args.prefix)
+    port = await server.start()
+    print(f"Serving {args.devices} devices on {args.host}:{port}, press Ctrl-C to stop")
+    while True:
+        await asyncio.sleep(3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A fake INDI server for testing and benchmarking indipyterm.")
+    parser.add_argument("--host", default="localhost", help="Hostname to listen on (default localhost).")
+    parser.add_argument("--port", type=int, default=7624, help="Port to listen on (default 7624).")
+    parser.add_argument("--devices", type=int, default=2, help="Number of devices (default 2).")
+    parser.add_argument("--vectors", type=int, default=20, help="Number of vectors per device (default 20).")
+    parser.add_argument("--members", type=int, default=4, help="Number of members per vector (default 4).")
+    parser.add_argument("--rate", type=int, default=10, help="Set vectors sent per second (default 10).")
+    parser.add_argument("--blobsize", type=int, default=5, help="Bytes in each BLOB member sent (default 5).")
+    parser.add_argument("--prefix", default="device", help="Start of the device names (default device).")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
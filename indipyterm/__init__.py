@@ -1,4 +1,11 @@
-
-from .iterm import IPyTerm, version
+from .version import version
 
 __all__ = ["IPyTerm", "version"]
+
+
+def __getattr__(name):
+    "IPyTerm is imported when first used, so importing the package does not import textual"
+    if name == "IPyTerm":
+        from .iterm import IPyTerm
+        return IPyTerm
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
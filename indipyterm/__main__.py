@@ -2,7 +2,12 @@
 
 import sys, argparse, pathlib
 
-from .iterm import IPyTerm, version
+from .timeline import timeline
+
+from .version import version
+
+# IPyTerm, and so textual and indipyclient, is only imported once the arguments
+# are checked, so --help and --version are given quickly
 
 
 if sys.version_info < (3, 10):
@@ -16,10 +21,27 @@ def main():
                                      description="Terminal client to communicate to an INDI service.")
     parser.add_argument("--port", type=int, default=7624, help="Port of the INDI server (default 7624).")
     parser.add_argument("--host", default="localhost", help="Hostname/IP of the INDI server (default localhost).")
+    parser.add_argument("--server", action="append", default=[], metavar="HOST:PORT",
+                        help="A further INDI server connected to at the same time, port 7624 if not given, may be repeated.")
     parser.add_argument("--blobfolder", help="Optional folder where BLOB's will be saved.")
+    parser.add_argument("--framerate", type=int, default=20, help="Maximum screen updates per second (default 20).")
+    parser.add_argument("--screencache", type=int, default=4, help="Number of device screens kept for fast switching (default 4).")
+    parser.add_argument("--loglines", type=int, default=200, help="Number of lines kept in each message log (default 200).")
+    parser.add_argument("--maxradio", type=int, default=8, help="OneOfMany switch vectors with more members are shown as a drop down list (default 8).")
+    parser.add_argument("--blobpolicy", nargs="+", action="append", default=[], metavar="NAME",
+                        help="DEVICE [VECTOR] VALUE, sets the enableBLOB value, Never, Also or Only, of a device or BLOB vector on every server, may be repeated (default Also).")
+    parser.add_argument("--blobconnection", action="store_true", help="Receive BLOBs on a second connection, so other values are not delayed by them.")
+    parser.add_argument("--nocache", action="store_true", help="Do not show the devices saved on the last exit while connecting, or save them on exit.")
+    parser.add_argument("--record", metavar="FILE", help="Record the data received to FILE, compressed if it ends in .gz, without starting the terminal.")
+    parser.add_argument("--replay", metavar="FILE", help="Replay a recording made with --record, rather than connecting to a server.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed of the replay, 0 for as fast as possible (default 1).")
+    parser.add_argument("--timeline", action="store_true", help="On exit, print the times taken to start, connect and receive the first definition.")
     parser.add_argument("--version", action="version", version=version)
     args = parser.parse_args()
 
+    timeline.enabled = args.timeline
+    timeline.mark("arguments parsed")
+
     if args.blobfolder:
         try:
             blobfolder = pathlib.Path(args.blobfolder).expanduser().resolve()
@@ -33,10 +55,70 @@ def main():
     else:
         blobfolder = None
 
+    if args.framerate < 1:
+        print("Error: The framerate should be a positive integer")
+        return 1
+
+    if args.loglines < 1:
+        print("Error: The loglines should be a positive integer")
+        return 1
+
+    if args.screencache < 0:
+        print("Error: The screencache should not be negative")
+        return 1
+
+    if args.maxradio < 0:
+        print("Error: The maxradio should not be negative")
+        return 1
+
+    blobpolicy = []
+    for policy in args.blobpolicy:
+        if (len(policy) not in (2, 3)) or (policy[-1] not in ("Never", "Also", "Only")):
+            print("Error: The blobpolicy should be a device name, an optional vector name, and one of Never, Also or Only")
+            return 1
+        if len(policy) == 2:
+            blobpolicy.append( (policy[0], None, policy[1]) )
+        else:
+            blobpolicy.append( tuple(policy) )
+
+    servers = []
+    for server in args.server:
+        host, _, port = server.rpartition(":")
+        if not host:
+            host, port = port, "7624"
+        if not port.isdigit():
+            print("Error: A server should be given as HOST:PORT")
+            return 1
+        servers.append( (host, int(port)) )
+
+    if args.speed < 0:
+        print("Error: The speed should not be negative")
+        return 1
+
+    if args.replay and not pathlib.Path(args.replay).is_file():
+        print("Error: The replay file should be an existing recording")
+        return 1
+
+    if args.record:
+        # record the session, BLOBs are only requested if given a blobpolicy of Also or Only
+        from .recorder import record
+        return record(args.host, args.port, args.record, blobpolicy)
+
+    from .iterm import IPyTerm
+    timeline.mark("imported")
+
     # run the IPyTerm app
-    app = IPyTerm(host=args.host, port=args.port, blobfolder=blobfolder)
+    app = IPyTerm(host=args.host, port=args.port, blobfolder=blobfolder, framerate=args.framerate, screencache=args.screencache,
+                  loglines=args.loglines, maxradio=args.maxradio, blobpolicy=blobpolicy, blobconnection=args.blobconnection,
+                  replay=args.replay, speed=args.speed, servers=servers, cache=not args.nocache)
+    timeline.mark("app initialised")
     app.run()
 
+    if args.timeline:
+        print("Startup timeline:", file=sys.stderr)
+        for line in timeline.lines():
+            print(line, file=sys.stderr)
+
     return 0
 
 
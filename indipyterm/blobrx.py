@@ -0,0 +1,159 @@
+
+import asyncio, binascii, logging, time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger()
+logger.addHandler(logging.NullHandler())
+
+
+# number of base64 characters decoded and written at a time, a multiple of 4
+CHUNKSIZE = 4 * 256 * 1024
+
+# minimum seconds between progress reports for each member
+PROGRESS_INTERVAL = 0.1
+
+# received BLOB contents are replaced by this, which decodes to a single zero byte
+PLACEHOLDER = "AA=="
+
+# whitespace which may be included in the base64 encoded text
+_WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+def _unique_path(folder, membername, timestampstring, fileformat):
+    "Return a path in folder which does not yet exist"
+    filename = membername + "_" + timestampstring + fileformat
+    counter = 0
+    while True:
+        filepath = folder / filename
+        if not filepath.exists():
+            return filepath
+        # append a digit to the filename
+        counter += 1
+        filename = membername + "_" + timestampstring + "_" + str(counter) + fileformat
+
+
+def _save(folder, membername, timestampstring, fileformat, text, report):
+    """Decode the base64 text and write it to a new file in folder, a chunk at a time,
+       calling report(done, total) with the number of characters decoded. The file is
+       written with a .part suffix, and renamed when complete. Returns the filename"""
+    filepath = _unique_path(folder, membername, timestampstring, fileformat)
+    total = len(text)
+    partpath = filepath.with_name(filepath.name + ".part")
+    carry = ""
+    lastreport = 0
+    try:
+        with partpath.open("wb") as f:
+            for start in range(0, total, CHUNKSIZE):
+                chunk = carry + text[start:start+CHUNKSIZE].translate(_WHITESPACE)
+                # decode a multiple of four characters, and carry the remainder
+                end = len(chunk) - len(chunk) % 4
+                f.write(binascii.a2b_base64(chunk[:end]))
+                carry = chunk[end:]
+                now = time.monotonic()
+                if now - lastreport > PROGRESS_INTERVAL:
+                    lastreport = now
+                    report(start + CHUNKSIZE, total)
+            if carry:
+                raise ValueError("Incomplete base64 data")
+        partpath.replace(filepath)
+    except Exception:
+        partpath.unlink(missing_ok=True)
+        raise
+    report(total, total)
+    return filepath.name
+
+
+class BLOBReceiver:
+    """Decodes received BLOBs and saves them to the BLOB folder, in a thread, so the
+       event loop is not held up by large BLOBs. As each setBLOBVector is received,
+       the contents of its members are taken out and replaced by a placeholder. When
+       the files are written, the setBLOBVector is passed to the client as an event,
+       with member.filename set to the file written.
+
+       BLOBs are saved in a single thread, in the order received, so the events of
+       a vector are also handled in the order received."""
+
+    def __init__(self, client, progress=None):
+        self.client = client
+        # progress(devicename, vectorname, membername, done, total) is called in
+        # the event loop as each member is saved
+        self.progress = progress
+        self._executor = None
+        # tasks waiting for BLOBs to be saved
+        self._tasks = set()
+        # the most recent task, each task waits for the previous one
+        self._last = None
+
+    def receive(self, xmldata):
+        "Start saving the BLOBs in this setBLOBVector, and return immediately"
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blobrx")
+        members = []
+        for member in xmldata:
+            if member.tag != "oneBLOB" or not member.text:
+                # leave it for the client to raise a ParseException
+                continue
+            members.append( (member.get("name"), member.get("format", ""), member.text) )
+            member.text = PLACEHOLDER
+        task = asyncio.create_task(self._save(xmldata, members, self._last))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._last = task
+
+    async def _save(self, xmldata, members, previous):
+        client = self.client
+        loop = asyncio.get_running_loop()
+        devicename = xmldata.get("device")
+        vectorname = xmldata.get("name")
+        timestamp = xmldata.get("timestamp")
+        if timestamp:
+            timestampstring = timestamp[:19].replace("-", "").replace("T", "_").replace(":", "_")
+        else:
+            timestampstring = time.strftime('%Y%m%d_%H_%M_%S', time.gmtime())
+
+        def reporter(membername):
+            "Return a function, called in the thread, which reports progress in the event loop"
+            if self.progress is None:
+                return lambda done, total: None
+            def report(done, total):
+                loop.call_soon_threadsafe(self.progress, devicename, vectorname, membername, min(done, total), total)
+            return report
+
+        filenames = {}
+        try:
+            for membername, fileformat, text in members:
+                folder = client.BLOBfolder
+                if not folder:
+                    # the folder has been cleared, the remaining BLOBs are not saved, but the
+                    # vector state, timestamp and message are still applied
+                    break
+                # as there is a single thread, each file is written before the next filename is chosen
+                filenames[membername] = await loop.run_in_executor(self._executor, _save, folder, membername,
+                                                                   timestampstring, fileformat, text, reporter(membername))
+        except Exception:
+            logger.exception("Unable to save BLOB")
+            await client.warning(f"Error: Unable to save BLOB {vectorname} of {devicename}")
+            return
+        finally:
+            if previous is not None and not previous.done():
+                # keep the events in the order received
+                await asyncio.wait([previous])
+        if devicename not in client:
+            # the device has been removed, or the connection cleared, since the BLOB was received
+            return
+        await client.rxblob(xmldata, filenames)
+
+    def clear(self):
+        "Stop waiting for BLOBs being saved"
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+        self._last = None
+
+    def shutdown(self):
+        self.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,88 @@
+
+import asyncio, binascii, logging, time
+
+from datetime import datetime, timezone
+
+from xml.sax.saxutils import quoteattr
+
+
+logger = logging.getLogger()
+logger.addHandler(logging.NullHandler())
+
+
+# number of bytes read, encoded and sent at a time, a multiple of 3 so the
+# base64 encoded chunks join without padding
+CHUNKSIZE = 3 * 256 * 1024
+
+
+def _readchunk(f):
+    "Read and base64 encode the next chunk of the file"
+    data = f.read(CHUNKSIZE)
+    if not data:
+        return b""
+    return binascii.b2a_base64(data, newline=False)
+
+
+async def sendfile(client, vector, membername, path, progress=None):
+    """Send the file at path as the BLOB member of the vector, reading and encoding
+       it a chunk at a time in a thread, and writing each chunk to the connection,
+       waiting for it to drain before the next, so the whole file is never held in memory.
+
+       progress(sent, total, seconds) is called after each chunk, with the number of bytes
+       of the file sent, and the seconds since the send started.
+
+       Other data is not sent while the file is being sent. If this is cancelled after
+       part of the file has been sent, the connection is closed, as the partly sent
+       xml cannot be recovered. Returns True if the file is sent."""
+    if not client.connected:
+        return False
+    loop = asyncio.get_running_loop()
+    total = path.stat().st_size
+    blobformat = "".join(path.suffixes) or vector.member(membername).blobformat
+    timestamp = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+    start = (f'<newBLOBVector device={quoteattr(vector.devicename)} name={quoteattr(vector.name)} timestamp="{timestamp.isoformat(sep="T")}">'
+             f'<oneBLOB name={quoteattr(membername)} size="{total}" format={quoteattr(blobformat)}>').encode()
+    end = b'</oneBLOB></newBLOBVector>'
+    started = time.monotonic()
+    sent = 0
+    partsent = False
+    async with client.sendlock:
+        writer = client._writer
+        if writer is None or (not client.connected) or client.stop:
+            return False
+        try:
+            with path.open("rb") as f:
+                writer.write(start)
+                partsent = True
+                while True:
+                    encoded = await loop.run_in_executor(None, _readchunk, f)
+                    if not encoded:
+                        break
+                    writer.write(encoded)
+                    await writer.drain()
+                    sent = min(sent + len(encoded) // 4 * 3, total)
+                    if progress is not None:
+                        progress(sent, total, time.monotonic() - started)
+            writer.write(end)
+            await writer.drain()
+            partsent = False
+        except asyncio.CancelledError:
+            if partsent:
+                await client.warning(f"BLOB send cancelled, closing connection to {client.indihost}:{client.indiport}")
+                await client._clear_connection()
+            raise
+        except Exception:
+            logger.exception("Exception sending BLOB file")
+            await client.warning(f"Sending Error on {client.indihost}:{client.indiport}")
+            await client._clear_connection()
+            return False
+    # set the vector and client timers as IPyClient.send and send_newBLOBVector do
+    vector.state = "Busy"
+    vector._timer = True
+    vector._newtimer = time.time()
+    if client.timeout_enable and client.tx_timer is None:
+        client.tx_timer = time.time()
+    client.idle_timer = time.time()
+    if progress is not None:
+        progress(total, total, time.monotonic() - started)
+    return True
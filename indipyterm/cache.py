@@ -0,0 +1,92 @@
+
+import gzip, logging, os, pathlib
+
+from datetime import datetime, timezone
+
+import xml.etree.ElementTree as ET
+
+
+logger = logging.getLogger()
+logger.addHandler(logging.NullHandler())
+
+
+def cachefolder():
+    "Return the folder holding the cache files, ~/.cache/indipyterm, or under XDG_CACHE_HOME if set"
+    base = os.environ.get("XDG_CACHE_HOME")
+    if base:
+        return pathlib.Path(base) / "indipyterm"
+    return pathlib.Path.home() / ".cache" / "indipyterm"
+
+
+def cachepath(host, port):
+    "Return the path of the cache file of the server at host and port"
+    name = "".join(c if (c.isalnum() or c in "-.") else "_" for c in str(host))
+    return cachefolder() / f"{name}_{port}.xml.gz"
+
+
+def _timestring(timestamp):
+    "Return the timestamp as an INDI timestamp string, in UTC without a timezone"
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.isoformat(sep="T")
+
+
+def defxml(vector):
+    """Return a def...Vector element defining the vector with its current values,
+       BLOB vectors are defined without their values"""
+    vectortype = vector.vectortype[:-len("Vector")]
+    element = ET.Element(f"def{vectortype}Vector", device=vector.devicename, name=vector.name,
+                         label=vector.label, group=vector.group, state=vector.state)
+    if vector.vectortype != "LightVector":
+        element.set("perm", vector.perm)
+        element.set("timeout", str(vector.timeout))
+    if vector.vectortype == "SwitchVector":
+        element.set("rule", vector.rule)
+    if vector.timestamp is not None:
+        element.set("timestamp", _timestring(vector.timestamp))
+    for member in vector.members().values():
+        child = ET.SubElement(element, f"def{vectortype}", name=member.name, label=member.label)
+        if vector.vectortype == "NumberVector":
+            child.set("format", member.format)
+            child.set("min", member.min)
+            child.set("max", member.max)
+            child.set("step", member.step)
+        if vector.vectortype != "BLOBVector":
+            child.text = member.membervalue
+    return element
+
+
+def save_cache(client, path):
+    """Write the definitions of the enabled vectors of the client to the cache file at path,
+       returns the number of vectors written. The file is written under another name
+       and then renamed, so an interrupted write does not leave a partial cache"""
+    root = ET.Element("indipyterm", host=str(client.indihost), port=str(client.indiport),
+                      saved=_timestring(datetime.now(tz=timezone.utc)))
+    count = 0
+    for device in list(client.values()):
+        if not device.enable:
+            continue
+        for vector in list(device.values()):
+            if vector.enable:
+                root.append(defxml(vector))
+                count += 1
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temppath = path.with_name(path.name + ".tmp")
+    # a low compression level, as this is written as the terminal exits
+    with gzip.open(temppath, "wb", compresslevel=1) as f:
+        ET.ElementTree(root).write(f)
+    os.replace(temppath, path)
+    return count
+
+
+def read_cache(path):
+    "Return a list of the definition elements in the cache file at path, an empty list if it cannot be read"
+    try:
+        with gzip.open(path, "rb") as f:
+            root = ET.parse(f).getroot()
+    except FileNotFoundError:
+        return []
+    except (OSError, EOFError, ET.ParseError):
+        logger.warning(f"Unable to read the cache file {path}")
+        return []
+    return list(root)
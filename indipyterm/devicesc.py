@@ -1,16 +1,241 @@
 
 from textual.app import ComposeResult
-from textual.widgets import Footer, Static, Log, TabbedContent, TabPane
+from textual.widgets import Footer, Static, TabbedContent, TabPane
 from textual.screen import Screen
 from textual.containers import Container, VerticalScroll
+from textual.widget import Widget
 from textual.message import Message
 
-from .iclient import localtimestring
+from .iclient import messagestrings, vector_signature
 
 from .vectorpn import VectorPane
 
+from .messagelog import MessageLog
+
+
+def estimate_height(vector):
+    "Return an estimate of the number of lines a VectorPane of this vector will take"
+    # border, timestamp and state, and vector message
+    lines = 5
+    if vector.vectortype == "SwitchVector" and vector.rule == "OneOfMany":
+        # the radio buttons are drawn in a horizontal radioset
+        lines += 5
+    elif vector.vectortype == "TextVector" and vector.perm != "ro":
+        lines += 7*len(vector)
+    else:
+        lines += 4*len(vector)
+    if vector.perm != "ro" and vector.vectortype not in ("LightVector", "BLOBVector"):
+        # the submit button
+        lines += 3
+    if vector.vectortype == "BLOBVector" and vector.perm != "wo":
+        # the choice of enableBLOB value
+        lines += 1
+    return lines
+
+
+class VectorSlot(Widget):
+    """Holds the place of a vector in a VectorScroll. When within the visible
+       region it contains a VectorPane, otherwise it is empty, with height set
+       to the last measured height of its VectorPane, or an estimate"""
+
+    DEFAULT_CSS = """
+        VectorSlot {
+            height: auto;
+            }
+        """
+
+    def __init__(self, vector):
+        self.vector = vector
+        self.filled = False
+        self.slot_height = estimate_height(vector)
+        # set to the awaitable removal of the VectorPane while it is being removed
+        self._removal = None
+        super().__init__()
+        self.styles.height = self.slot_height
+
+    @property
+    def outer_height(self):
+        "The current height of the slot, or its expected height if not yet laid out"
+        if self.filled and self.outer_size.height:
+            return self.outer_size.height
+        return self.slot_height
+
+    def fill(self):
+        "Mount a VectorPane in this slot"
+        if self.filled:
+            return
+        self.filled = True
+        self.styles.height = "auto"
+        self.call_later(self._mount_pane)
+
+    async def _mount_pane(self):
+        if self._removal is not None:
+            # a previous VectorPane, with the same id, must be removed first
+            await self._removal
+            self._removal = None
+        if self.filled and not self.children:
+            await self.mount(VectorPane(self.vector))
+
+    def redraw(self):
+        "Replace the VectorPane, if one is drawn, by a new one drawn from the vector as now defined"
+        if not self.filled:
+            self.slot_height = estimate_height(self.vector)
+            self.styles.height = self.slot_height
+            return
+        if self.children:
+            # remove the ids of members no longer in the vector
+            vectorpane = self.children[0]
+            for member in vectorpane.signature[-1]:
+                if member[0] not in self.vector:
+                    self.app.itemid.unset(self.screen.serverid, self.vector.devicename, self.vector.name, member[0])
+        self.empty()
+        self.fill()
+
+    def empty(self):
+        "Remove the VectorPane, keeping its height"
+        if not self.filled:
+            return
+        self.filled = False
+        if self.outer_size.height:
+            self.slot_height = self.outer_size.height
+        self.styles.height = self.slot_height
+        self._removal = self.remove_children()
+
+
+class VectorScroll(VerticalScroll):
+    """A VerticalScroll of VectorSlots, where only those slots intersecting the
+       visible region, plus an overscan above and below, hold VectorPanes. Updates
+       to vectors without a VectorPane are only recorded in the client"""
+
+    # number of lines above and below the visible region to keep drawn
+    OVERSCAN = 20
+
+    def __init__(self):
+        # vectorname to VectorSlot
+        self.slots = {}
+        self._update_due = False
+        # the name of a vector kept at the top while the slots around it are drawn
+        self._anchor = None
+        super().__init__()
+
+    def add_vectors(self, vectors):
+        "Mount slots for the vectors, if they do not already have them"
+        newslots = []
+        for vector in vectors:
+            if vector.name in self.slots:
+                continue
+            slot = VectorSlot(vector)
+            self.slots[vector.name] = slot
+            newslots.append(slot)
+        if newslots:
+            self.mount_all(newslots)
+            self.refresh_slots()
+
+    def remove_vector(self, vectorname):
+        slot = self.slots.pop(vectorname, None)
+        if slot is not None:
+            slot.remove()
+            self.refresh_slots()
+
+    def reconcile_vector(self, vector):
+        "Draw the vector again, as its definition has changed, or add it if it has no slot"
+        slot = self.slots.get(vector.name)
+        if slot is None:
+            self.add_vectors([vector])
+            return
+        slot.redraw()
+        self.refresh_slots()
+
+    def resync(self, vectors):
+        """Remove slots of vectors no longer present, add new ones, and update those drawn,
+           drawing again only those whose definition has changed"""
+        vectornames = set(vector.name for vector in vectors)
+        for vectorname, slot in list(self.slots.items()):
+            if vectorname not in vectornames:
+                self.app.itemid.clear_vector(self.screen.serverid, slot.vector)
+                self.remove_vector(vectorname)
+            elif slot.filled and slot.children:
+                vectorpane = slot.children[0]
+                if vectorpane.signature == vector_signature(slot.vector):
+                    vectorpane.resync()
+                else:
+                    slot.redraw()
+        self.add_vectors(vectors)
+        self.refresh_slots()
+
+    def show_vector(self, vectorname):
+        "Scroll the slot of the vector to the top, once the slots are laid out"
+        self.call_after_refresh(self._scroll_to_slot, vectorname)
+
+    def _scroll_to_slot(self, vectorname):
+        if vectorname in self.slots:
+            self._anchor = vectorname
+            self.refresh_slots()
+
+    def focus_slot(self, slot):
+        """Focus the first widget of the VectorPane of the slot which can take focus, or
+           if none can, remove the focus, so a widget elsewhere is not scrolled into view"""
+        for widget in slot.query("*"):
+            if widget.focusable:
+                widget.focus(scroll_visible=False)
+                return
+        self.screen.set_focus(None)
+
+    def watch_scroll_y(self, old_value, new_value):
+        super().watch_scroll_y(old_value, new_value)
+        self.refresh_slots()
+
+    def on_resize(self, event):
+        self.refresh_slots()
+
+    def refresh_slots(self):
+        "Request the slots are filled or emptied after the next screen refresh"
+        if self._update_due:
+            return
+        self._update_due = True
+        self.call_after_refresh(self.update_slots)
+
+    def update_slots(self):
+        "Fill the slots intersecting the visible region, and empty the rest"
+        self._update_due = False
+        if not self.screen.is_current:
+            # widget ids are set for the device currently shown, so
+            # a hidden device screen must not draw vectors
+            return
+        anchor = self.slots.get(self._anchor) if self._anchor else None
+        scrolled = False
+        if anchor is not None:
+            # drawn vectors may differ in height from their estimates, moving the
+            # anchored vector, so it is scrolled to the top again
+            scrolled = self.scroll_to_widget(anchor, top=True, animate=False, immediate=True)
+        top = self.scroll_y - self.OVERSCAN
+        bottom = self.scroll_y + self.size.height + self.OVERSCAN
+        filling = False
+        y = 0
+        for slot in self.slots.values():
+            height = slot.outer_height
+            if (y + height > top) and (y < bottom):
+                if not slot.filled:
+                    filling = True
+                    slot.fill()
+            else:
+                slot.empty()
+            y += height
+        if filling or scrolled:
+            # newly drawn vectors may differ in height from their estimates
+            self.refresh_slots()
+        elif anchor is not None:
+            if any(slot.filled and not slot.children for slot in self.slots.values()):
+                # panes are still being mounted, and may move the anchored vector
+                self.refresh_slots()
+            else:
+                self._anchor = None
+                self.focus_slot(anchor)
+
 
 class GroupTabPane(TabPane):
+    """A tab of vectors, these are only composed when the tab is first shown,
+       until then updates to its vectors are only recorded in the client"""
 
     class AddVector(Message):
         """pass new vector to the pane."""
@@ -21,23 +246,57 @@ class GroupTabPane(TabPane):
 
     def __init__(self, groupname, groupid):
         self.groupname = groupname
+        # set True when the vectors have been drawn
+        self.built = False
         super().__init__(groupname, id=groupid)
 
     def compose(self):
+        "The vectors are drawn into this VectorScroll when the tab is first shown"
+        yield VectorScroll()
+
+    def on_show(self):
+        self.build()
+
+    def build(self):
         "For every vector draw it"
-        devicename = self.app.itemid.devicename
-        device = self.app.indiclient[devicename]
+        if self.built:
+            return
+        self.built = True
+        itemid = self.app.itemid
+        device = self.app.get_device(itemid.serverid, itemid.devicename)
         vectors = list(vector for vector in device.values() if vector.group == self.groupname and vector.enable)
-        with VerticalScroll():
-            for vector in vectors:
-                yield VectorPane(vector)
+        self.query_one(VectorScroll).add_vectors(vectors)
+
+    def remove_vector(self, vectorname):
+        self.query_one(VectorScroll).remove_vector(vectorname)
+
+    def show_vector(self, vectorname):
+        "Draw the vectors of this tab, if not yet drawn, scrolled to this vector"
+        self.build()
+        self.query_one(VectorScroll).show_vector(vectorname)
+
+    def reconcile_vector(self, vector):
+        "Draw the vector again, or add it to this tab, if the tab has been drawn"
+        if not self.built:
+            return
+        self.query_one(VectorScroll).reconcile_vector(vector)
+
+    def resync(self):
+        "Add and remove vectors to match the device, and show their current values"
+        if not self.built:
+            # nothing drawn, so nothing to resync
+            return
+        itemid = self.app.itemid
+        device = self.app.get_device(itemid.serverid, itemid.devicename)
+        vectors = list(vector for vector in device.values() if vector.group == self.groupname and vector.enable)
+        self.query_one(VectorScroll).resync(vectors)
 
     def on_group_tab_pane_add_vector(self, message: AddVector) -> None:
         "Add a vector to this tab"
-        vector = message.vector
-        # get the VerticalScroll containing the vectors
-        vs = self.query_one(VerticalScroll)
-        vs.mount(VectorPane(vector))
+        if not self.built:
+            # the vector will be drawn with the others when the tab is shown
+            return
+        self.query_one(VectorScroll).add_vectors([message.vector])
 
 
 
@@ -61,6 +320,14 @@ class GroupPane(Container):
             super().__init__()
 
 
+    class ReconcileVector(Message):
+        "This vector has been defined again, and is drawn differently or is in another group"
+
+        def __init__(self, vector):
+            self.vector = vector
+            super().__init__()
+
+
     class DelVector(Message):
         "Delete this vector"
 
@@ -72,8 +339,8 @@ class GroupPane(Container):
 
     def compose(self):
         "Create the widget holding tabs of groups, each grouptab will contain its vectors"
-        devicename = self.app.itemid.devicename
-        device = self.app.indiclient[devicename]
+        itemid = self.app.itemid
+        device = self.app.get_device(itemid.serverid, itemid.devicename)
         groupset = set(vector.group for vector in device.values() if vector.enable)
         grouplist = list(groupset)
         grouplist.sort()
@@ -83,6 +350,25 @@ class GroupPane(Container):
                 yield GroupTabPane(groupname, groupid)
 
 
+    def resync(self):
+        "Add and remove group tabs to match the device, and resync their vectors"
+        itemid = self.app.itemid
+        device = self.app.get_device(itemid.serverid, itemid.devicename)
+        groupset = set(vector.group for vector in device.values() if vector.enable)
+        tc = self.query_one('#dev_groups')
+        shown = set()
+        for grouptabpane in tc.query(GroupTabPane):
+            if grouptabpane.groupname in groupset:
+                shown.add(grouptabpane.groupname)
+                grouptabpane.resync()
+            else:
+                tc.remove_pane(grouptabpane.id)
+                itemid.unset_group(itemid.serverid, itemid.devicename, grouptabpane.groupname)
+        for groupname in sorted(groupset - shown):
+            groupid = self.app.itemid.set_group_id(groupname)
+            tc.add_pane(GroupTabPane(groupname, groupid))
+
+
     def on_group_pane_add_group(self, message: AddGroup) -> None:
         groupname = message.groupname
         groupid = self.app.itemid.set_group_id(groupname)
@@ -90,25 +376,47 @@ class GroupPane(Container):
         tc.add_pane(GroupTabPane(groupname, groupid))
 
 
+    def on_group_pane_reconcile_vector(self, message: ReconcileVector) -> None:
+        """Move the vector to the tab of its group, removing it from any other, and draw it
+           again, then remove any group tab left without vectors"""
+        vector = message.vector
+        tc = self.query_one('#dev_groups')
+        grouptab = None
+        for grouptabpane in tc.query(GroupTabPane):
+            if grouptabpane.groupname == vector.group:
+                grouptab = grouptabpane
+            else:
+                grouptabpane.remove_vector(vector.name)
+        if grouptab is None:
+            groupid = self.app.itemid.set_group_id(vector.group)
+            tc.add_pane(GroupTabPane(vector.group, groupid))
+        else:
+            grouptab.reconcile_vector(vector)
+        groupset = set(v.group for v in vector.device.values() if v.enable)
+        for grouptabpane in tc.query(GroupTabPane):
+            if grouptabpane.groupname not in groupset:
+                tc.remove_pane(grouptabpane.id)
+                self.app.itemid.unset_group(self.screen.serverid, vector.devicename, grouptabpane.groupname)
+
+
     def on_group_pane_del_vector(self, message: DelVector) -> None:
         vector = message.vector
-        vectorid = message.vectorid
-        vectorwidget = self.query_one(f"#{vectorid}")
-        vectorwidget.remove()
+        # get the group of the deleted vector
+        grp = vector.group
+        grpid = self.app.itemid.get_group_id(grp)
+        if grpid is None:
+            return
+        grouptabpane = self.query_one(f"#{grpid}")
+        grouptabpane.remove_vector(vector.name)
         # remove the vector id's
-        self.app.itemid.clear_vector(vector)
+        self.app.itemid.clear_vector(self.screen.serverid, vector)
         # vector removed, does its group need to be removed?
         groupset = set(v.group for v in vector.device.values() if v.enable)
-        # get the group of the deleted vector
-        grp = vector.group
         if grp not in groupset:
             # the grp no longer has enabled contents, and must be removed
-            grpid = self.app.itemid.get_group_id(grp)
-            if grpid is None:
-                return
             tc = self.query_one("#dev_groups")
             tc.remove_pane(grpid)
-            self.app.itemid.unset_group(vector.devicename, grp)
+            self.app.itemid.unset_group(self.screen.serverid, vector.devicename, grp)
 
 
 class MessagesPane(Container):
@@ -121,7 +429,7 @@ class MessagesPane(Container):
             border: mediumvioletred;
            }
 
-        MessagePane > Log {
+        MessagesPane > MessageLog {
             width: 100%;
             height: 100%;
             background: $panel;
@@ -134,37 +442,45 @@ class MessagesPane(Container):
     class ShowLogs(Message):
         """pass messages to the pane."""
 
-        def __init__(self, messagelog: str) -> None:
+        def __init__(self, messagelog: str, timestamp=None) -> None:
             self.messagelog = messagelog
+            self.timestamp = timestamp
             super().__init__()
 
     def compose(self) -> ComposeResult:
         self.border_title = "Device Messages"
-        yield Log()
+        # timestamp of the latest message shown
+        self.lastshown = None
+        yield MessageLog(capacity=self.app.loglines)
 
 
     def on_mount(self):
-        log = self.query_one("Log")
-        devicename = self.app.itemid.devicename
-        messages = self.app.indiclient[devicename].messages
-        if messages:
-            log.write_lines( reversed([ localtimestring(t) + "  " + m for t,m in messages]) )
+        itemid = self.app.itemid
+        devicename = itemid.devicename
+        if self.app.get_device(itemid.serverid, devicename).messages:
+            self.show_messages()
         else:
-            log.write(f"Messages from {devicename} will appear here")
+            log = self.query_one(MessageLog)
+            log.write_line(f"Messages from {devicename} will appear here")
+
+    def show_messages(self):
+        "Show messages stored in the device which are newer than those already shown"
+        itemid = self.app.itemid
+        # messages are stored in the device with the newest first
+        messages = list(self.app.get_device(itemid.serverid, itemid.devicename).messages)
+        if self.lastshown is not None:
+            messages = [ (t,m) for t,m in messages if t > self.lastshown ]
+        if not messages:
+            return
+        self.lastshown = messages[0][0]
+        log = self.query_one(MessageLog)
+        log.write_lines( reversed(messagestrings(messages)) )
 
     def on_messages_pane_show_logs(self, message: ShowLogs) -> None:
-        log = self.query_one("Log")
-        if log.line_count < 32:
-            log.write_line(message.messagelog)
-            return
-        # if greater than 32, clear logs, and show the last eight
-        # stored as a deque in indiclient[devicename]
-        devicename = self.app.itemid.devicename
-        log.clear()
-        if self.app.indiclient is not None:
-            messages = list(self.app.indiclient[devicename].messages)
-            mlist = reversed([ localtimestring(t) + "  " + m for t,m in messages ])
-            log.write_lines(mlist)
+        if message.timestamp is not None:
+            self.lastshown = message.timestamp
+        log = self.query_one(MessageLog)
+        log.write_line(message.messagelog)
 
 
 
@@ -184,25 +500,105 @@ class DeviceSc(Screen):
 
     ENABLE_COMMAND_PALETTE = False
 
-    BINDINGS = [("m", "main", "Main Screen")]
+    BINDINGS = [("m", "main", "Main Screen"), ("b", "blobpolicy", "Device BLOBs")]
 
-    def __init__(self, devicename):
-        "set devicename in connections module"
-        self.app.itemid.devicename = devicename
+    def __init__(self, serverid, devicename):
+        "set the device, of the client with this serverid, as the device shown"
+        self.serverid = serverid
+        self.devicename = devicename
+        self.app.itemid.set_device(serverid, devicename)
+        # the name of a vector to be shown when this screen is next current
+        self.showvector = None
         super().__init__()
 
     def compose(self) -> ComposeResult:
-        devicename = self.app.itemid.devicename
-        yield Static(devicename, id="devicename")
+        yield Static(self.title_text(), id="devicename")
         yield Footer()
         yield MessagesPane(id="dev-messages-pane")
         yield GroupPane(id="dev-group-pane")
 
+    def on_screen_resume(self):
+        # the visible region of each VectorScroll may need drawing
+        for vectorscroll in self.query(VectorScroll):
+            vectorscroll.refresh_slots()
+        if self.showvector:
+            self.call_after_refresh(self._show_vector)
+
+    def show_vector(self, vectorname):
+        "Show the tab of the group of the vector, scrolled to the vector"
+        self.showvector = vectorname
+        if self.is_current:
+            self.call_after_refresh(self._show_vector)
+
+    def _show_vector(self):
+        vectorname = self.showvector
+        self.showvector = None
+        if not vectorname:
+            return
+        vector = self.app.get_device(self.serverid, self.devicename).get(vectorname)
+        if (vector is None) or (not vector.enable):
+            return
+        groupid = self.app.itemid.get_group_id(vector.group)
+        if groupid is None:
+            return
+        self.query_one("#dev_groups", TabbedContent).active = groupid
+        self.query_one(f"#{groupid}", GroupTabPane).show_vector(vectorname)
+
+    def resync(self):
+        """This screen is being shown again after being hidden, during which time
+           events for this device were not applied, so bring it up to date"""
+        self.query_one(MessagesPane).show_messages()
+        self.query_one(GroupPane).resync()
+
+
+    def title_text(self):
+        """The device name, and its server if there is more than one, followed by the enableBLOB
+           value chosen for the device, if any, and a note if the connection was lost and the
+           device has not been defined again"""
+        text = self.devicename
+        iclient = self.app.get_client(self.serverid)
+        if (iclient is not None) and (len(self.app.indiclients) > 1):
+            text += f"    on {iclient.indihost}:{iclient.indiport}"
+        value = self.app.blobpolicy.get(self.serverid, self.devicename)
+        if value is not None:
+            text += f"    BLOBs: {value}"
+        if (iclient is not None) and iclient.is_stale(self.devicename):
+            if iclient.connected:
+                text += "    -- Stale, waiting for the server --"
+            else:
+                text += "    -- Stale, not connected --"
+        return text
+
+    def update_title(self):
+        self.query_one("#devicename").update(self.title_text())
+
+    async def action_blobpolicy(self) -> None:
+        """Event handler called when b pressed, steps through the enableBLOB values
+           of the device, and the default"""
+        choices = self.app.blobpolicy.VALUES
+        if self.app.blobpolicy.get(None, self.devicename) is None:
+            # the default can only be chosen if no value is given for every server
+            choices = (None,) + choices
+        value = self.app.blobpolicy.get(self.serverid, self.devicename)
+        value = choices[(choices.index(value) + 1) % len(choices)]
+        iclient = self.app.get_client(self.serverid)
+        if iclient is None:
+            self.app.blobpolicy.set(value, self.serverid, self.devicename)
+        else:
+            await iclient.set_blobpolicy(value, self.devicename)
+        self.update_title()
+        if value is None:
+            value = "Default"
+        if (iclient is None) or (not iclient.BLOBfolder):
+            self.notify(f"BLOBs: {value}, applied when a BLOB folder is set")
+        else:
+            self.notify(f"BLOBs: {value}")
 
     def action_main(self) -> None:
         """Event handler called when m pressed."""
-        self.app.indiclient.clientdata['devicesc'] = None
-        self.app.itemid.devicename = None
+        for iclient in self.app.indiclients:
+            iclient.clientdata['devicesc'] = None
+        self.app.itemid.set_device()
         self.app.pop_screen()
 
 
@@ -1,16 +1,171 @@
+import os, threading
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable
 
+from textual import on
 from textual.app import ComposeResult
-from textual.widgets import Button, DirectoryTree
+from textual.widgets import Button, DirectoryTree, Input
+from textual.widgets.directory_tree import DirEntry
 from textual.screen import ModalScreen
 from textual.containers import Container, Horizontal
 
 
+# the number of entries of a directory added to the tree at a time
+PAGESIZE = 200
+
+
+class DirectoryListings():
+    """Caches the listings of directories, as sorted lists of (name, is_dir) tuples,
+       hidden entries are left out. A listing is read again if the modification time
+       of its directory has changed. Listings are read in worker threads, so access
+       is locked."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        # path to (mtime, listing), the most recently used last
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._listings)
+
+    def get(self, path):
+        "Return the listing of the directory at path, an empty list if it cannot be read"
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._listings.move_to_end(path)
+                return cached[1]
+        listing = self._scan(path)
+        with self._lock:
+            self._listings[path] = (mtime, listing)
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.maxsize:
+                self._listings.popitem(last=False)
+        return listing
+
+    @staticmethod
+    def _scan(path):
+        "Read the directory with os.scandir, which gives the entry type without a stat call for each"
+        listing = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        isdir = entry.is_dir()
+                    except OSError:
+                        isdir = False
+                    listing.append((entry.name, isdir))
+        except OSError:
+            pass
+        listing.sort(key=lambda item: (not item[1], item[0].lower()))
+        return listing
+
+
+# kept while the app runs, so a directory opened again is not read again if unchanged
+listings = DirectoryListings()
+
+
+def name_filter(pattern):
+    """Return a function which tests a file name against the pattern, an extension if
+       it starts with a dot, such as .fits, otherwise the start of the name. The test
+       is not case sensitive, and an empty pattern matches every name"""
+    pattern = pattern.strip().lower()
+    if not pattern:
+        return lambda name: True
+    if pattern.startswith("."):
+        return lambda name: name.lower().endswith(pattern)
+    return lambda name: name.lower().startswith(pattern)
+
+
+@dataclass
+class MoreEntry(DirEntry):
+    "The data of a 'more' entry, holding the (path, is_dir) entries of its directory not yet added"
+
+    remaining: list = field(default_factory=list)
+
 
 class FilteredDirectoryTree(DirectoryTree):
-    def filter_paths(self, paths: Iterable[Path]) -> Iterable[Path]:
-        return [path for path in paths if not path.name.startswith(".")]
+    """A DirectoryTree which lists directories from the cached listings, shows only
+       those files which match self.pattern, and adds the entries of a directory a
+       page at a time, the remainder being shown by a 'more' entry, which adds the
+       next page when selected"""
+
+    def __init__(self, path, pattern="", **kwargs):
+        self.pattern = pattern
+        # directory path to the (path, is_dir) entries found by filter_paths, but not
+        # in the page returned, taken by _populate_node to add a 'more' entry
+        self._remaining = {}
+        self._lock = threading.Lock()
+        super().__init__(path, **kwargs)
+
+    def set_pattern(self, pattern):
+        "Show only files matching the new pattern, the listings are not read again unless changed"
+        if pattern != self.pattern:
+            self.pattern = pattern
+            self.reload()
+
+    def filter_paths(self, paths):
+        """Called in a thread with the paths of a directory, returns the first page of
+           its entries matching the pattern, and keeps the remainder for the 'more' entry.
+           Only the first path is taken, to find the directory, whose entries are then
+           taken from the cached listing, which gives whether each is a directory."""
+        first = next(iter(paths), None)
+        if first is None:
+            return []
+        directory = first.parent
+        matches = name_filter(self.pattern)
+        content = [ (directory / name, isdir) for name, isdir in listings.get(directory) if isdir or matches(name) ]
+        remaining = content[PAGESIZE:]
+        with self._lock:
+            # replaces any remainder of an earlier load of this directory
+            if remaining:
+                self._remaining[directory] = remaining
+            else:
+                self._remaining.pop(directory, None)
+        return [ path for path, isdir in content[:PAGESIZE] ]
+
+    def _populate_node(self, node, content):
+        """Adds the page of entries, sorted by DirectoryTree, then a 'more' entry
+           after them if filter_paths left any entries of the directory out"""
+        # _populate_node is private to DirectoryTree, though unchanged from textual 3.6 to 8,
+        # and is overridden as the 'more' entry must be added after the entries are sorted
+        content = list(content)
+        super()._populate_node(node, content)
+        if not content:
+            return
+        with self._lock:
+            remaining = self._remaining.pop(content[0].parent, None)
+        if remaining:
+            self._add_more(node, content[0].parent, remaining)
+
+    def _add_more(self, node, directory, remaining):
+        "Add a 'more' entry, holding the remaining entries of the directory, as the last child of node"
+        label = f"{len(remaining)} more"
+        node.add_leaf(label, data=MoreEntry(directory / label, remaining=remaining))
+
+    def on_directory_tree_file_selected(self, event):
+        "Selecting a 'more' entry replaces it by the next page of entries"
+        more = event.node.data
+        if not isinstance(more, MoreEntry):
+            return
+        event.stop()
+        node = event.node
+        parent = node.parent
+        node.remove()
+        for path, isdir in more.remaining[:PAGESIZE]:
+            parent.add(path.name, data=DirEntry(path), allow_expand=isdir)
+        remaining = more.remaining[PAGESIZE:]
+        if remaining:
+            self._add_more(parent, more.path.parent, remaining)
 
 
 class FilePane(Container):
@@ -29,18 +184,34 @@ class FilePane(Container):
             margin: 1;
            }
 
-        Horizontal {
+        FilePane > Horizontal {
             height: auto;
             align: right middle;
            }
 
+        FilePane > #folder-row > #folder {
+            width: 1fr;
+           }
+
+        FilePane > #folder-row > #filter {
+            width: 24;
+           }
+
         Button {
             margin-right: 2;
             }
         """
 
+    def __init__(self, folder):
+        self.folder = folder
+        super().__init__()
+
     def compose(self) -> ComposeResult:
-        yield FilteredDirectoryTree("/")
+        with Horizontal(id="folder-row"):
+            yield Button("Up", id="up")
+            yield Input(str(self.folder), id="folder")
+            yield Input(placeholder="Filter .ext or name", id="filter")
+        yield FilteredDirectoryTree(self.folder)
         with Horizontal():
             yield Button("Cancel", variant="primary", id="cancel")
             yield Button("Send", variant="primary", id="send", disabled=True)
@@ -48,7 +219,31 @@ class FilePane(Container):
     def on_mount(self):
         self.border_title = "Choose File"
 
+    def set_folder(self, folder):
+        "Show the tree of the given folder"
+        self.folder = folder
+        self.query_one("#folder").value = str(folder)
+        self.query_one(FilteredDirectoryTree).path = folder
 
+    @on(Input.Submitted, "#folder")
+    def folder_submitted(self, event):
+        event.stop()
+        folder = Path(event.value).expanduser()
+        if folder.is_dir():
+            self.set_folder(folder.resolve())
+        else:
+            event.input.value = str(self.folder)
+
+    @on(Input.Changed, "#filter")
+    def filter_changed(self, event):
+        event.stop()
+        self.query_one(FilteredDirectoryTree).set_pattern(event.value)
+
+    @on(Button.Pressed, "#up")
+    def up_pressed(self, event):
+        event.stop()
+        if self.folder.parent != self.folder:
+            self.set_folder(self.folder.parent)
 
 
 
@@ -62,12 +257,16 @@ class ChooseFileSc(ModalScreen):
             }
         """
 
+    # the folder of the last file chosen, shown when the screen is next opened
+    lastfolder = None
+
     def __init__(self):
         self.selected_filepath = None
         super().__init__()
 
     def compose(self) -> ComposeResult:
-        yield FilePane()
+        folder = ChooseFileSc.lastfolder or self.app.blobfolder or Path.home()
+        yield FilePane(folder)
 
     def on_directory_tree_directory_selected(self, event):
         "On a directory being selected, disable the send button"
@@ -86,4 +285,6 @@ class ChooseFileSc(ModalScreen):
         if event.button.id == "cancel":
             self.dismiss(None)
         if event.button.id == "send":
+            if self.selected_filepath is not None:
+                ChooseFileSc.lastfolder = self.selected_filepath.parent
             self.dismiss(self.selected_filepath)
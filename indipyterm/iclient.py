@@ -1,45 +1,195 @@
 
-import logging
+import asyncio, logging, random, time, bisect, heapq, re
+
+import xml.etree.ElementTree as ET
 
 import indipyclient as ipc
 
+from indipyclient import events
+
+from indipyclient.propertymembers import ParseException
+
+from indipyclient.ipyclient import _STARTTAGS, _ENDTAGS
+
+from .blobrx import BLOBReceiver
+
+from .cache import read_cache, save_cache
+
+from .timeline import timeline
+
 
 logger = logging.getLogger()
 logger.addHandler(logging.NullHandler())
 
 
 
-def localtimestring(t):
-    "Return a string of the local time (not date)"
-    localtime = t.astimezone(tz=None)
-    # convert microsecond to integer between 0 and 100
-    ms = localtime.microsecond//10000
-    return f"{localtime.strftime('%H:%M:%S')}.{ms:0>2d}"
+class TimeFormatter:
+    """Formats timestamps as local time strings HH:MM:SS.hh
+
+       The local UTC offset is cached for a window of fifteen minutes, and is only
+       cached if it is the same at the start and end of the window, so a change to
+       or from daylight saving time is picked up. The HH:MM:SS prefix is formatted
+       once per second, so timestamps within the same second only add hundredths."""
+
+    # the length in seconds of the window over which the UTC offset is cached
+    WINDOW = 900
+
+    # ".00" to ".99"
+    _HUNDREDTHS = tuple(f".{hs:0>2d}" for hs in range(100))
 
+    def __init__(self):
+        # posix seconds between which self._offset is valid
+        self._start = 0
+        self._end = 0
+        self._offset = 0
+        # the last second formatted, and its HH:MM:SS string
+        self._second = None
+        self._prefix = ""
+
+    def _setoffset(self, second):
+        "Sets the UTC offset valid for the given posix second"
+        start = second - second % self.WINDOW
+        end = start + self.WINDOW
+        self._offset = time.localtime(second).tm_gmtoff
+        if (time.localtime(start).tm_gmtoff == self._offset) and (time.localtime(end-1).tm_gmtoff == self._offset):
+            self._start = start
+            self._end = end
+        else:
+            # the offset changes within this window, so only cache this second
+            self._start = second
+            self._end = second + 1
+
+    def localtimestring(self, t):
+        "Return a string of the local time (not date) of the given datetime"
+        if t.tzinfo is None:
+            # a naive datetime is taken as local time
+            return t.strftime('%H:%M:%S') + self._HUNDREDTHS[t.microsecond//10000]
+        second = int(t.timestamp())
+        if second != self._second:
+            if not (self._start <= second < self._end):
+                self._setoffset(second)
+            localsecond = (second + self._offset) % 86400
+            self._second = second
+            self._prefix = f"{localsecond//3600:0>2d}:{localsecond//60%60:0>2d}:{localsecond%60:0>2d}"
+        # convert microsecond to integer between 0 and 100
+        return self._prefix + self._HUNDREDTHS[t.microsecond//10000]
+
+    def messagestrings(self, messages):
+        """Given an iterable of (timestamp, message) tuples, such as the messages deque
+           of a device, return a list of 'localtime  message' strings in the same order"""
+        localtimestring = self.localtimestring
+        return [ localtimestring(t) + "  " + m for t,m in messages ]
+
+
+# The formatter used by this package, timestamps are received from the event loop, so
+# calls to localtimestring and messagestrings should only be made from the event loop
+
+timeformatter = TimeFormatter()
+
+localtimestring = timeformatter.localtimestring
+
+messagestrings = timeformatter.messagestrings
+
+
+
+def displayvalue(vector, membername):
+    "Return the string to be displayed for the given member"
+    if vector.vectortype == "NumberVector":
+        # display a formatted number string rather than the received number
+        return vector.getformattedvalue(membername)
+    if vector.vectortype == "BLOBVector":
+        # display the received filename rather than the binary blob received
+        # the vector.member() method returns the member given its name
+        return vector.member(membername).filename
+    return vector[membername]
+
+
+def vector_signature(vector):
+    """Return a tuple of the attributes of the vector from which its widgets are drawn,
+       so a definition which changes how the vector is drawn can be detected"""
+    if vector.vectortype == "NumberVector":
+        members = tuple((member.name, member.label, member.format, member.min, member.max, member.step)
+                        for member in vector.members().values())
+    else:
+        members = tuple((member.name, member.label) for member in vector.members().values())
+    return (vector.vectortype, vector.group, vector.label, vector.perm, vector.rule, members)
 
 
 class ItemID():
+    """Gives ids to the widgets of devices, groups, vectors and members.
+
+       Devices are known by the serverid of their client and their devicename, so
+       devices of the same name on different servers are kept apart. Forward
+       dictionaries map (serverid, devicename, vectorname, membername) and
+       (serverid, devicename, groupname) keys to integer id numbers, and a reverse
+       dictionary maps item id numbers back to keys. A further dictionary records the
+       keys belonging to each device, so a device can be cleared without reference to
+       the device object. Unset keys are deleted, so the size of the index follows
+       the items currently known."""
+
+    __slots__ = ("_itemdict", "_groupdict", "_keydict", "_devicekeys", "_itemid", "serverid", "devicename")
 
     def __init__(self):
+        # (serverid, devicename, vectorname, membername) to id number
         self._itemdict = {}
+        # (serverid, devicename, groupname) to id number
         self._groupdict = {}
+        # id number to (serverid, devicename, vectorname, membername)
+        self._keydict = {}
+        # (serverid, devicename) to a set of its keys in self._itemdict and self._groupdict
+        # group keys are distinguished by being three element tuples
+        self._devicekeys = {}
         # Every device, vector, widget will be given an id
         # starting with characters 'id' followed by a string number
         # created by incrementing this self._itemid
         self._itemid = 0
 
-        # devicename needs to be set
+        # the device currently shown, set by set_device
+        self.serverid = None
         self.devicename = None
 
     def __bool__(self):
         return bool(self._itemdict)
 
+    def __len__(self):
+        "The number of items and groups with ids"
+        return len(self._itemdict) + len(self._groupdict)
+
+    def set_device(self, serverid=None, devicename=None):
+        "Set the device currently shown, whose widgets are given ids, or with no arguments, none"
+        self.serverid = serverid
+        self.devicename = devicename
+
+    def _newid(self, key):
+        "Add key to self._devicekeys, and return a new id number"
+        self._itemid += 1
+        keyset = self._devicekeys.get(key[:2])
+        if keyset is None:
+            self._devicekeys[key[:2]] = {key}
+        else:
+            keyset.add(key)
+        return self._itemid
+
+    def _delete(self, key):
+        "Remove key from the dictionaries"
+        if len(key) == 3:
+            self._groupdict.pop(key, None)
+        else:
+            idnumber = self._itemdict.pop(key, None)
+            if idnumber is not None:
+                del self._keydict[idnumber]
+        keyset = self._devicekeys.get(key[:2])
+        if keyset is not None:
+            keyset.discard(key)
+            if not keyset:
+                del self._devicekeys[key[:2]]
+
     def get_group_id(self, groupname):
         if self.devicename is None:
             return
         if not groupname:
             raise KeyError("A group name must be given to get a group id")
-        idnumber = self._groupdict.get((self.devicename, groupname))
+        idnumber = self._groupdict.get((self.serverid, self.devicename, groupname))
         if idnumber is None:
             return
         return "gid"+str(idnumber)
@@ -50,20 +200,19 @@ class ItemID():
             return
         if not groupname:
             raise KeyError("A group name must be given to set a group id")
-        idnumber = self._groupdict.get((self.devicename, groupname))
+        key = (self.serverid, self.devicename, groupname)
+        idnumber = self._groupdict.get(key)
         if idnumber is None:
-            self._itemid += 1
-            self._groupdict[self.devicename, groupname] = self._itemid
-            return "gid"+str(self._itemid)
+            idnumber = self._groupdict[key] = self._newid(key)
         return "gid"+str(idnumber)
 
 
-    def unset_group(self, devicename, groupname):
+    def unset_group(self, serverid, devicename, groupname):
         if not devicename:
             raise KeyError("A devicename must be given to unset a group id")
         if not groupname:
             raise KeyError("A group name must be given to unset a group id")
-        self._groupdict[devicename, groupname] = None
+        self._delete((serverid, devicename, groupname))
 
 
     def get_id(self, vectorname=None, membername=None):
@@ -75,12 +224,21 @@ class ItemID():
             membername = None
         if membername and (not vectorname):
             raise KeyError("If a membername is specified, a vectorname must also be given")
-        idnumber = self._itemdict.get((self.devicename, vectorname, membername))
+        idnumber = self._itemdict.get((self.serverid, self.devicename, vectorname, membername))
         if idnumber is None:
             return
         return "id"+str(idnumber)
 
 
+    def _set_item(self, key):
+        "Return the id of key, creating it if necessary"
+        idnumber = self._itemdict.get(key)
+        if idnumber is None:
+            idnumber = self._itemdict[key] = self._newid(key)
+            self._keydict[idnumber] = key
+        return "id"+str(idnumber)
+
+
     def set_id(self, vectorname=None, membername=None):
         "This create ids for widgets, and returns the id"
         if self.devicename is None:
@@ -91,15 +249,10 @@ class ItemID():
             membername = None
         if membername and (not vectorname):
             raise KeyError("If a membername is specified, a vectorname must also be given")
-        idnumber = self._itemdict.get((self.devicename, vectorname, membername))
-        if idnumber is None:
-            self._itemid += 1
-            self._itemdict[self.devicename, vectorname, membername] = self._itemid
-            return "id"+str(self._itemid)
-        return "id"+str(idnumber)
+        return self._set_item((self.serverid, self.devicename, vectorname, membername))
 
 
-    def unset(self, devicename, vectorname=None, membername=None):
+    def unset(self, serverid, devicename, vectorname=None, membername=None):
         if not vectorname:
             vectorname = None
         if not membername:
@@ -108,91 +261,1193 @@ class ItemID():
             raise KeyError("A devicename must be given to unset an id")
         if membername and (not vectorname):
             raise KeyError("If a membername is specified, a vectorname must also be given")
-        self._itemdict[devicename, vectorname, membername] = None
+        self._delete((serverid, devicename, vectorname, membername))
 
 
-    def get_devicid(self, devicename):
+    def get_devicid(self, serverid, devicename):
         if devicename is None:
             return
-        idnumber = self._itemdict.get((devicename, None, None))
+        idnumber = self._itemdict.get((serverid, devicename, None, None))
         if idnumber is None:
             return
         return "id"+str(idnumber)
 
 
-    def set_devicid(self, devicename):
+    def set_devicid(self, serverid, devicename):
         "This create id for a device"
         if devicename is None:
             return
-        idnumber = self._itemdict.get((devicename, None, None))
-        if idnumber is None:
-            self._itemid += 1
-            self._itemdict[devicename, None, None] = self._itemid
-            return "id"+str(self._itemid)
-        return "id"+str(idnumber)
+        return self._set_item((serverid, devicename, None, None))
 
 
-    def clear_device(self, device):
-        "clear the id's of device, and its vectors and members"
-        self.unset(device.devicename)
-        for vectorname in device:
-            self.unset(device.devicename, vectorname)
-            self.unset_group(device.devicename, device[vectorname].group)
-            membernamelist = list(device[vectorname].keys())
-            for membername in membernamelist:
-                self.unset(device.devicename, vectorname, membername)
+    def clear_device(self, serverid, device):
+        "clear the id's of device, and its vectors, groups and members"
+        keyset = self._devicekeys.pop((serverid, device.devicename), None)
+        if not keyset:
+            return
+        for key in keyset:
+            if len(key) == 3:
+                del self._groupdict[key]
+            else:
+                del self._keydict[self._itemdict.pop(key)]
 
 
-    def clear_vector(self, vector):
+    def clear_vector(self, serverid, vector):
         "delete the ids of the vector and all its members"
-        self.unset(vector.devicename, vector.name)
+        self.unset(serverid, vector.devicename, vector.name)
         membernamelist = list(vector.keys())
         for membername in membernamelist:
-            self.unset(vector.devicename, vector.name, membername)
+            self.unset(serverid, vector.devicename, vector.name, membername)
 
 
-    def get_devicename(self, deviceid):
-        "Given an id, get the devicename, or return None if it does not exist"
-        idnumber = int(deviceid.strip("id"))
-        for key,value in self._itemdict.items():
-            if value == idnumber:
-                return key[0]
+    def get_device(self, deviceid):
+        "Given an id, get the (serverid, devicename) of its device, or return None if it does not exist"
+        if not deviceid.startswith("id"):
+            return
+        try:
+            idnumber = int(deviceid[2:])
+        except ValueError:
+            return
+        key = self._keydict.get(idnumber)
+        if key is None:
+            return
+        return key[:2]
 
     def clear(self):
         self._itemdict.clear()
         self._groupdict.clear()
+        self._keydict.clear()
+        self._devicekeys.clear()
         self._itemid = 0
 
 
 
-class IClient(ipc.IPyClient):
+class WidgetRegistry():
+    """Maps (serverid, devicename, vectorname, membername) to the live VectorPane and member
+       pane widgets, and (serverid, devicename, vectorname) to the vector submit message
+       widget. Widgets add themselves when mounted and remove themselves when unmounted."""
+
+    def __init__(self):
+        self._panes = {}
+        self._submits = {}
+
+    def __len__(self):
+        return len(self._panes)
+
+    def add_pane(self, widget, serverid, devicename, vectorname, membername=None):
+        self._panes[serverid, devicename, vectorname, membername] = widget
+
+    def remove_pane(self, widget, serverid, devicename, vectorname, membername=None):
+        "Remove the widget, if it has not already been replaced by another"
+        key = (serverid, devicename, vectorname, membername)
+        if self._panes.get(key) is widget:
+            del self._panes[key]
+
+    def get_pane(self, serverid, devicename, vectorname, membername=None):
+        "Return the widget, or None if it is not mounted"
+        return self._panes.get((serverid, devicename, vectorname, membername))
+
+    def add_submit(self, widget, serverid, devicename, vectorname):
+        self._submits[serverid, devicename, vectorname] = widget
+
+    def remove_submit(self, widget, serverid, devicename, vectorname):
+        "Remove the widget, if it has not already been replaced by another"
+        key = (serverid, devicename, vectorname)
+        if self._submits.get(key) is widget:
+            del self._submits[key]
+
+    def get_submit(self, serverid, devicename, vectorname):
+        "Return the submit message widget, or None if it is not mounted"
+        return self._submits.get((serverid, devicename, vectorname))
+
+    def clear(self):
+        self._panes.clear()
+        self._submits.clear()
+
+
+
+class BLOBPolicy():
+    """The enableBLOB value, Never, Also or Only, chosen for devices and BLOB vectors.
+       A vector without a value of its own takes the value of its device, and a device
+       without a value takes the default. The values are kept by the app, so they
+       continue to apply if the client is disconnected and a new connection made.
+
+       Values are set for the device of a server, given by its serverid, or with a
+       serverid of None, for devices of that name on every server, as the values given
+       on the command line are. A value for a server is used before one for every server."""
+
+    VALUES = ("Never", "Also", "Only")
+
+    def __init__(self, policies=()):
+        # (serverid, devicename, vectorname) to value, vectorname is None for a device value
+        # and serverid is None for a value applying to every server
+        self._values = {}
+        for devicename, vectorname, value in policies:
+            self.set(value, None, devicename, vectorname)
+
+    def __len__(self):
+        return len(self._values)
+
+    def set(self, value, serverid, devicename, vectorname=None):
+        """Set the value for the device or vector, a value of None removes it, though
+           a value set for every server continues to apply"""
+        if value is None:
+            self._values.pop((serverid, devicename, vectorname), None)
+            return
+        if value not in self.VALUES:
+            raise ValueError(f"The enableBLOB value should be one of {', '.join(self.VALUES)}")
+        self._values[serverid, devicename, vectorname] = value
+
+    def get(self, serverid, devicename, vectorname=None):
+        """Return the value set for this device or vector, on this server or else on every
+           server, or None if it has none of its own"""
+        value = self._values.get((serverid, devicename, vectorname))
+        if value is None:
+            return self._values.get((None, devicename, vectorname))
+        return value
+
+    def value(self, serverid, devicename, vectorname=None, default="Also"):
+        "Return the value which applies to the device or vector"
+        if vectorname is not None:
+            value = self.get(serverid, devicename, vectorname)
+            if value is not None:
+                return value
+        value = self.get(serverid, devicename)
+        if value is None:
+            return default
+        return value
+
+    def vectors(self, serverid, devicename):
+        """Return the names of the vectors of the device which have values of their own,
+           on this server or on every server"""
+        return list(set( vectorname for sid, dname, vectorname in self._values
+                         if (sid is None or sid == serverid) and dname == devicename and vectorname is not None ))
+
+
+
+class RenderScheduler():
+    """Collects changes to displayed vectors as events are received, keeping only
+       the latest value of each, and applies them to the widgets at no more than
+       framerate times a second.
+
+       The last value recorded for each vector state, message and member is remembered,
+       and values which have not changed are not passed on to the widgets. If only the
+       timestamps of a vector and its message have changed, they are shown at no more
+       than once a second."""
+
+    # seconds between updates of timestamps of vectors which have not otherwise changed
+    TIMESTAMP_INTERVAL = 1.0
+
+    def __init__(self, app, framerate=20):
+        self.app = app
+        self.framerate = framerate
+        # dictionary of (serverid, devicename, vectorname) to a dictionary of pending changes
+        # which may have keys "vtime", "vstate", "vmessage", "radio" and "members",
+        # where "members" is a dictionary of membername to value
+        self._pending = {}
+        # dictionary of (serverid, devicename, vectorname) to a dictionary of changes with keys
+        # "vtime" and "vmessage", where only the timestamps have changed, to be shown at a lower rate
+        self._timestamps = {}
+        # dictionary of (serverid, devicename, vectorname) to a dictionary of the last values recorded
+        # with keys "vstate", "message" and "members", where "message" is the message without
+        # its timestamp and "members" is a dictionary of membername to the value received,
+        # rather than the formatted value
+        self._last = {}
+        # True if a call to self.flush is due
+        self._scheduled = False
+        # True if a call to self.flush_timestamps is due
+        self._timestamps_scheduled = False
+        self._lastflush = 0.0
+
+    def __len__(self):
+        return len(self._pending) + len(self._timestamps)
+
+    def _changes(self, serverid, devicename, vectorname):
+        changes = self._pending.get((serverid, devicename, vectorname))
+        if changes is None:
+            changes = self._pending[serverid, devicename, vectorname] = {}
+            # any timestamps waiting to be shown can be shown with these changes
+            timestamps = self._timestamps.pop((serverid, devicename, vectorname), None)
+            if timestamps is not None:
+                changes.update(timestamps)
+            self._schedule()
+        return changes
+
+    def _last_values(self, serverid, devicename, vectorname):
+        last = self._last.get((serverid, devicename, vectorname))
+        if last is None:
+            last = self._last[serverid, devicename, vectorname] = {}
+        return last
+
+    def _set_timestamp(self, serverid, devicename, vectorname, key, value):
+        "Record a vtime or vmessage where only the timestamp has changed"
+        pending = self._pending.get((serverid, devicename, vectorname))
+        if pending is not None:
+            # other changes are pending, so this timestamp can be shown with them
+            pending[key] = value
+            return
+        timestamps = self._timestamps.get((serverid, devicename, vectorname))
+        if timestamps is None:
+            self._timestamps[serverid, devicename, vectorname] = {key:value}
+            self._schedule_timestamps()
+        else:
+            timestamps[key] = value
+
+    def set_vector(self, serverid, devicename, vectorname, vtime, vstate):
+        "Record the vtime and vstate to be shown on the vector pane"
+        last = self._last_values(serverid, devicename, vectorname)
+        if last.get("vstate") != vstate:
+            last["vstate"] = vstate
+            self._changes(serverid, devicename, vectorname).update(vtime=vtime, vstate=vstate)
+        else:
+            self._set_timestamp(serverid, devicename, vectorname, "vtime", vtime)
+
+    def set_message(self, serverid, devicename, vectorname, timestring, message):
+        "Record a message, received at the timestring, to be shown on the vector pane"
+        last = self._last_values(serverid, devicename, vectorname)
+        vmessage = timestring + "  " + message
+        if last.get("message") != message:
+            last["message"] = message
+            self._changes(serverid, devicename, vectorname)["vmessage"] = vmessage
+        else:
+            self._set_timestamp(serverid, devicename, vectorname, "vmessage", vmessage)
+
+    def member_changed(self, serverid, devicename, vectorname, membername, value):
+        """Return True if the value received for this member differs from the last
+           recorded, and record it. The value is that received rather than the formatted
+           value, so the formatting can be skipped if it has not changed"""
+        last = self._last_values(serverid, devicename, vectorname)
+        members = last.get("members")
+        if members is None:
+            members = last["members"] = {}
+        elif membername in members and members[membername] == value:
+            return False
+        members[membername] = value
+        return True
+
+    def set_member(self, serverid, devicename, vectorname, membername, value):
+        "Record a value to be shown on the member pane"
+        changes = self._changes(serverid, devicename, vectorname)
+        members = changes.get("members")
+        if members is None:
+            changes["members"] = {membername:value}
+        else:
+            members[membername] = value
+
+    def reset_radio(self, serverid, devicename, vectorname):
+        "Record that the radio members of a OneOfMany vector are to be updated"
+        self._changes(serverid, devicename, vectorname)["radio"] = True
+
+    def forget(self, serverid, devicename, vectorname=None, key=None):
+        """Forget the last values recorded for a vector, or only the given key, such as "vstate",
+           so the next values received are shown. This is needed if the widget has been changed
+           other than by this scheduler, or has not received events while hidden. If vectorname
+           is None, values are forgotten for all vectors of the device."""
+        if vectorname is None:
+            for vectorkey in [ vectorkey for vectorkey in self._last if vectorkey[:2] == (serverid, devicename) ]:
+                del self._last[vectorkey]
+            return
+        if key is None:
+            self._last.pop((serverid, devicename, vectorname), None)
+            return
+        last = self._last.get((serverid, devicename, vectorname))
+        if last is not None:
+            last.pop(key, None)
+
+    def discard(self, serverid, devicename, vectorname=None):
+        "Discard pending changes for a vector, or if vectorname is None, for all vectors of a device"
+        self.forget(serverid, devicename, vectorname)
+        if vectorname:
+            self._pending.pop((serverid, devicename, vectorname), None)
+            self._timestamps.pop((serverid, devicename, vectorname), None)
+            return
+        for pending in (self._pending, self._timestamps):
+            for key in [ key for key in pending if key[:2] == (serverid, devicename) ]:
+                del pending[key]
+
+    def clear(self):
+        self._pending.clear()
+        self._timestamps.clear()
+        self._last.clear()
+
+    def _schedule(self):
+        "Ensure a flush is due, no sooner than one frame after the last flush"
+        if self._scheduled:
+            return
+        self._scheduled = True
+        frametime = 1/self.framerate if self.framerate else 0
+        delay = self._lastflush + frametime - time.monotonic()
+        if delay > 0:
+            self.app.set_timer(delay, self.flush, name="render-scheduler")
+        else:
+            self.app.call_later(self.flush)
+
+    def _schedule_timestamps(self):
+        "Ensure a flush of timestamps is due"
+        if self._timestamps_scheduled:
+            return
+        self._timestamps_scheduled = True
+        self.app.set_timer(self.TIMESTAMP_INTERVAL, self.flush_timestamps, name="render-timestamps")
+
+    def flush_timestamps(self):
+        "Show timestamps of vectors which have not otherwise changed"
+        self._timestamps_scheduled = False
+        if not self._timestamps:
+            return
+        timestamps = self._timestamps
+        self._timestamps = {}
+        registry = self.app.registry
+        for (serverid, devicename, vectorname), changes in timestamps.items():
+            vectorpane = registry.get_pane(serverid, devicename, vectorname)
+            if vectorpane is None:
+                continue
+            if "vtime" in changes:
+                vectorpane.vtime = changes["vtime"]
+            if "vmessage" in changes:
+                vectorpane.vmessage = changes["vmessage"]
+
+    def flush(self):
+        "Apply all pending changes to the widgets of the device currently shown"
+        self._scheduled = False
+        self._lastflush = time.monotonic()
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+        registry = self.app.registry
+        for (serverid, devicename, vectorname), changes in pending.items():
+            vectorpane = registry.get_pane(serverid, devicename, vectorname)
+            if vectorpane is None:
+                # this vector is not being shown
+                continue
+            if "vtime" in changes:
+                vectorpane.vtime = changes["vtime"]
+            if "vstate" in changes:
+                vectorpane.vstate = changes["vstate"]
+            if "vmessage" in changes:
+                vectorpane.vmessage = changes["vmessage"]
+            if changes.get("radio"):
+                vectorpane.query_one("RadioMembers").update_values()
+            members = changes.get("members")
+            if not members:
+                continue
+            for membername, value in members.items():
+                memberpane = registry.get_pane(serverid, devicename, vectorname, membername)
+                if memberpane is not None:
+                    memberpane.mvalue = value
+
+
+
+class EventStats():
+    """Counts the events handled by IClient.rxevent, by event type, and
+       records the time taken to handle each in a histogram"""
+
+    # upper limits in seconds of the histogram bins, the last bin holds anything longer
+    BINS = (0.00001, 0.00003, 0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03)
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.started = time.monotonic()
+        # dictionary of eventtype to number of events
+        self.counts = {}
+        self.histogram = [0] * (len(self.BINS) + 1)
+        self.total = 0
+        self.totaltime = 0.0
+        self.maxtime = 0.0
+
+    def record(self, eventtype, seconds):
+        "Record an event of eventtype, which took the given seconds to handle"
+        self.counts[eventtype] = self.counts.get(eventtype, 0) + 1
+        self.histogram[bisect.bisect_left(self.BINS, seconds)] += 1
+        self.total += 1
+        self.totaltime += seconds
+        if seconds > self.maxtime:
+            self.maxtime = seconds
+
+
+def _words(text):
+    "Return the set of words, runs of letters and digits, in the lower case text"
+    return set(re.findall(r"[^\W_]+", text))
+
+
+def _terms(query):
+    "Return the list of lower case terms of a search, split as the words of the index"
+    return re.findall(r"[^\W_]+", query.lower())
+
+
+class SearchIndex():
+    """An index of the device, group, vector and member names and labels of every vector,
+       searched by the find screen. Entries are added and removed as each vector is defined
+       and deleted, so devices are never rescanned by a search.
+
+       Each term of a search, split into words as the names and labels are, is matched
+       against the start of their words, found by bisecting a sorted list of every word.
+       Only if too few vectors match in this way are the entries containing every character
+       of the search scored as a fuzzy match, with the characters of each term in order."""
+
+    # the maximum number of results returned by a search
+    MAXRESULTS = 50
+
+    def __init__(self):
+        # (serverid, devicename, vectorname) to a tuple of the lower case text searched, the
+        # vector name and label, group, device name, then member names and labels
+        self._entries = {}
+        # (serverid, devicename, vectorname) to the texts joined by newlines, for a fast fuzzy test,
+        # and the length of the vector name and label at its start
+        self._joined = {}
+        # (serverid, devicename, vectorname) to (group, vector label, member labels), as shown in results
+        self._labels = {}
+        # word to a dictionary of key to 2, or to 3 if the word is in the vector name or label
+        self._bywords = {}
+        # every word in the index, sorted, so words starting with a term are found by bisect
+        self._wordlist = []
+        # character to the set of keys of entries containing it
+        self._bychar = {}
+        # the last fuzzy search and the keys it matched, as a search continuing
+        # the last can only match entries matched by the last
+        self._last = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_vector(self, serverid, vector):
+        "Add the vector of the client with this serverid, or replace its entry if it is already present"
+        key = (serverid, vector.devicename, vector.name)
+        self.remove_vector(*key)
+        members = vector.members().values()
+        texts = [vector.name, vector.label, vector.group, vector.devicename]
+        for member in members:
+            texts.append(member.name)
+            texts.append(member.label)
+        texts = tuple(text.lower() for text in texts)
+        self._entries[key] = texts
+        joined = "\n".join(texts)
+        self._joined[key] = (joined, len(texts[0]) + len(texts[1]) + 1)
+        self._labels[key] = (vector.group, vector.label, tuple(member.label for member in members))
+        vectorwords = _words(texts[0] + " " + texts[1])
+        for word in vectorwords | _words(" ".join(texts[2:])):
+            keys = self._bywords.get(word)
+            if keys is None:
+                keys = self._bywords[word] = {}
+                bisect.insort(self._wordlist, word)
+            keys[key] = 3 if word in vectorwords else 2
+        for c in set(joined):
+            keys = self._bychar.get(c)
+            if keys is None:
+                self._bychar[c] = {key}
+            else:
+                keys.add(key)
+        self._last = None
+
+    def remove_vector(self, serverid, devicename, vectorname):
+        "Remove the entry of the vector, if present"
+        key = (serverid, devicename, vectorname)
+        texts = self._entries.pop(key, None)
+        if texts is None:
+            return
+        joined = self._joined.pop(key)[0]
+        del self._labels[key]
+        for word in _words(joined):
+            keys = self._bywords[word]
+            del keys[key]
+            if not keys:
+                del self._bywords[word]
+                del self._wordlist[bisect.bisect_left(self._wordlist, word)]
+        for c in set(joined):
+            keys = self._bychar[c]
+            keys.discard(key)
+            if not keys:
+                del self._bychar[c]
+        self._last = None
+
+    def remove_device(self, serverid, devicename):
+        "Remove the entries of every vector of the device"
+        for key in [key for key in self._entries if key[:2] == (serverid, devicename)]:
+            self.remove_vector(*key)
+
+    def clear(self):
+        self._entries.clear()
+        self._joined.clear()
+        self._labels.clear()
+        self._bywords.clear()
+        self._wordlist.clear()
+        self._bychar.clear()
+        self._last = None
+
+    def _prefixed(self, term):
+        "Return a dictionary of key to score of the entries with a word starting with the term"
+        found = {}
+        index = bisect.bisect_left(self._wordlist, term)
+        while (index < len(self._wordlist)) and self._wordlist[index].startswith(term):
+            for key, score in self._bywords[self._wordlist[index]].items():
+                if score > found.get(key, 0):
+                    found[key] = score
+            index += 1
+        return found
+
+    def _word_matches(self, terms):
+        "Return a dictionary of key to score of the entries with words starting with every term"
+        matches = None
+        for term in sorted(terms, key=len, reverse=True):
+            found = self._prefixed(term)
+            if matches is None:
+                matches = found
+            else:
+                matches = {key: score + found[key] for key, score in matches.items() if key in found}
+            if not matches:
+                break
+        return matches
+
+    def _fuzzy_matches(self, query, terms):
+        "Return a dictionary of key to score of the entries matching every term as a fuzzy match"
+        if (self._last is not None) and query.startswith(self._last[0]):
+            candidates = self._last[1]
+        else:
+            sets = []
+            for c in set(query.replace(" ", "")):
+                keys = self._bychar.get(c)
+                if not keys:
+                    return {}
+                sets.append(keys)
+            sets.sort(key=len)
+            candidates = sets[0].intersection(*sets[1:])
+        # the characters of each term in order within a single text
+        patterns = [re.compile("[^\n]*?".join(re.escape(c) for c in term)) for term in terms]
+        matches = {}
+        for key in candidates:
+            joined, vectorend = self._joined[key]
+            if not all(pattern.search(joined) for pattern in patterns):
+                continue
+            # matches within the vector name or label rank above the rest
+            matches[key] = sum(2 if pattern.search(joined, 0, vectorend) else 1 for pattern in patterns)
+        self._last = (query, set(matches))
+        return matches
+
+    def _matched_member(self, key, terms):
+        "Return the label of the first member whose name or label contains a term, or None"
+        texts = self._entries[key]
+        for term in terms:
+            if any(term in text for text in texts[:4]):
+                continue
+            for index in range(4, len(texts)):
+                if term in texts[index]:
+                    return self._labels[key][2][(index - 4) // 2]
+
+    def search(self, query):
+        """Return a list of up to MAXRESULTS results, best first, each a tuple of serverid,
+           devicename, vectorname, group, vector label, and the label of a member matched, or None"""
+        terms = _terms(query)
+        if not terms:
+            return []
+        query = " ".join(terms)
+        # matches of the start of words rank above fuzzy matches
+        matches = self._word_matches(terms)
+        ranked = heapq.nsmallest(self.MAXRESULTS, matches, key=lambda key: (-matches[key], key))
+        if (len(ranked) < self.MAXRESULTS) and any(len(term) > 1 for term in terms):
+            # a single character is not enough for a useful fuzzy match
+            fuzzy = self._fuzzy_matches(query, terms)
+            ranked.extend(heapq.nsmallest(self.MAXRESULTS - len(ranked), (key for key in fuzzy if key not in matches),
+                                          key=lambda key: (-fuzzy[key], key)))
+        results = []
+        for key in ranked[:self.MAXRESULTS]:
+            group, label, memberlabels = self._labels[key]
+            results.append( key + (group, label, self._matched_member(key, terms)) )
+        return results
+
+
+
+class XMLInput():
+    """Replaces the IPyClient methods which read and parse received data, so that long
+       messages, such as BLOBs, are parsed as they arrive. Used as the first base class
+       of the clients in this module."""
+
+    async def _datainput(self):
+        """Waits for binary data ending in > from the port, or for a block of data
+           if none is found within READBLOCK bytes.
+           Returns None if notconnected/stop flags arises"""
+        binarydata = bytearray()
+        while self.connected and (not self._stop):
+            await asyncio.sleep(0)
+            try:
+                data = await self._reader.readuntil(separator=b'>')
+            except asyncio.LimitOverrunError:
+                data = await self._reader.read(n=32000)
+            except asyncio.IncompleteReadError:
+                # the server has closed the connection, rather than waiting for
+                # the connection to time out, raise an error so it is closed now
+                raise ConnectionError(f"Connection closed by {self.indihost}:{self.indiport}")
+            except Exception:
+                binarydata.clear()
+                await asyncio.sleep(0.1)
+                continue
+            if not data:
+                if self._reader.at_eof():
+                    raise ConnectionError(f"Connection closed by {self.indihost}:{self.indiport}")
+                await asyncio.sleep(0.01)
+                continue
+            # data received
+            self.tx_timer = None
+            self.idle_timer = time.time()
+            binarydata += data
+            if (b">" in data) or (len(binarydata) >= self.READBLOCK):
+                return bytes(binarydata)
+
+    # the maximum size of block returned by _datainput if no > is found
+    READBLOCK = 1048576
+
+    async def _xmlinput(self):
+        """get received data, parse it, and return it as xml.etree.ElementTree object
+           Returns None if notconnected/stop flags arises.
+
+           As IPyClient._xmlinput, but the data is fed to the xml parser as it is
+           received, rather than being appended to a single message which is parsed
+           when complete. So a long message, such as a BLOB, is parsed in small steps
+           and is not repeatedly copied as it grows."""
+        parser = None
+        endtag = b""
+        # the last received bytes, as long as the endtag
+        tail = b""
+        while self.connected and (not self._stop):
+            await asyncio.sleep(0)
+            data = await self._datainput()
+            if data is None:
+                return
+            if not self.connected:
+                return
+            if self._stop:
+                return
+            if parser is None:
+                # data is expected to start with <tag, first strip any newlines
+                data = data.strip()
+                for index, st in enumerate(_STARTTAGS):
+                    if data.startswith(st):
+                        break
+                    elif st in data:
+                        # remove any data prior to a starttag
+                        data = data[data.index(st):]
+                        break
+                else:
+                    # data does not start with a recognised tag, so ignore it
+                    # and continue waiting for a valid message start
+                    continue
+                endtag = _ENDTAGS[index]
+                parser = ET.XMLParser()
+                tail = b""
+                # either further children of this tag are coming, or maybe its a single tag ending in "/>"
+                if data.endswith(b'/>'):
+                    try:
+                        parser.feed(data)
+                        return parser.close()
+                    except ET.ParseError:
+                        # failed to parse the message, continue at beginning
+                        parser = None
+                        continue
+            try:
+                parser.feed(data)
+                tail = (tail + data[-len(endtag):])[-len(endtag):]
+                if tail == endtag:
+                    # the message is complete, xml datablock done, return it
+                    return parser.close()
+            except ET.ParseError:
+                # failed to parse the message, continue at beginning
+                parser = None
+                continue
+
+
+
+class IClient(XMLInput, ipc.IPyClient):
+
+    # seconds before the first attempt to reconnect, doubled after each failed
+    # attempt up to RECONNECT_MAX, each delay is randomly reduced by up to half,
+    # so clients of a restarted server do not all reconnect at the same moment
+    RECONNECT_MIN = 1.0
+    RECONNECT_MAX = 60.0
+
+    # a connection lasting this many seconds resets the delay to RECONNECT_MIN
+    RECONNECT_STABLE = 10.0
+
+    # stale devices and vectors are removed if not defined again, once no definitions
+    # have been received for RECONCILE_QUIET seconds, or if none are received at all,
+    # after RECONCILE_WAIT seconds
+    RECONCILE_QUIET = 2.0
+    RECONCILE_WAIT = 10.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # saves received BLOBs in a thread, rather than in the event loop
+        self.blobreceiver = BLOBReceiver(self, self.blobprogress)
+        # held while data is being sent, so a BLOB file sent in chunks is not interrupted
+        self.sendlock = asyncio.Lock()
+        # (devicename, vectorname, membername) to the worker sending a file to that member
+        self.blobsends = {}
+        # devicename to device, of the devices of this client with buttons on the start screen
+        self.shown = {}
+        # (devicename, vectorname) of the devices and vectors, with vectorname None for a device,
+        # which have not been defined again since the connection was lost
+        self.stale = set()
+        # (devicename, vectorname) to the vector_signature of its last definition
+        self.defined = {}
+        # the time.monotonic() of the last definition received
+        self._lastdefine = time.monotonic()
+        # the task removing stale devices and vectors, and True while it is removing them
+        self._sweeper = None
+        self._sweeping = False
+        # if app.blobconnection is True, BLOBs are received on a second connection
+        if self.clientdata['app'].blobconnection:
+            self.blobclient = BLOBClient(self)
+        else:
+            self.blobclient = None
+
+    def _set_BLOBfolder(self, value):
+        ipc.IPyClient.BLOBfolder.fset(self, value)
+        if self.blobclient is not None:
+            self.blobclient.folderchanged()
+
+    BLOBfolder = property(fget=ipc.IPyClient.BLOBfolder.fget, fset=_set_BLOBfolder,
+                          doc=ipc.IPyClient.BLOBfolder.__doc__)
+
+    async def _comms(self):
+        """As IPyClient._comms, but the devices are not cleared when the connection is lost,
+           so the widgets showing them remain, marked as stale, until they are defined
+           again by the server. Reconnection is attempted with an exponential backoff.
+           If a cache file is given, the devices saved in it are shown before connecting"""
+        try:
+            if self.clientdata.get('cachefile'):
+                await self.load_cache()
+            attempts = 0
+            while not self._stop:
+                self.tx_timer = None
+                self.idle_timer = time.time()
+                t2 = None
+                t3 = None
+                connected = None
+                try:
+                    await self.warning(f"Attempting to connect to {self.indihost}:{self.indiport}")
+                    self._reader, self._writer = await asyncio.open_connection(self.indihost, self.indiport)
+                    connected = time.monotonic()
+                    self.messages.clear()
+                    await self.warning(f"Connected to {self.indihost}:{self.indiport}")
+                    await self.rxevent(events.ConnectionMade())
+                    if self.stale:
+                        self._update_titles(set(key[0] for key in self.stale))
+                        self.start_sweep()
+                    if self.enabledlen():
+                        # _check_alive only asks for the properties if no devices are known,
+                        # so ask for them here, to define again the devices kept
+                        await self.send_getProperties()
+                        await self.report("getProperties sent")
+                    t2 = asyncio.create_task(self._run_rx())
+                    t3 = asyncio.create_task(self._check_alive())
+                    await asyncio.gather(t2, t3)
+                except ConnectionRefusedError:
+                    await self.warning(f"Connection refused on {self.indihost}:{self.indiport}")
+                except ConnectionError:
+                    await self.warning(f"Connection Lost on {self.indihost}:{self.indiport}")
+                except OSError:
+                    await self.warning(f"Connection Error on {self.indihost}:{self.indiport}")
+                except Exception:
+                    logger.exception(f"Connection Error on {self.indihost}:{self.indiport}")
+                    await self.warning("Connection failed")
+                await self._clear_connection()
+                # connection has failed, ensure all tasks are done
+                for task in (t2, t3):
+                    if task is not None:
+                        while not task.done():
+                            await asyncio.sleep(0)
+                if self._stop:
+                    break
+                if (connected is not None) and (time.monotonic() - connected > self.RECONNECT_STABLE):
+                    attempts = 0
+                delay = min(self.RECONNECT_MAX, self.RECONNECT_MIN * 2 ** attempts)
+                delay = random.uniform(delay / 2, delay)
+                attempts += 1
+                await self.warning(f"Connection failed, re-trying in {delay:.1f} seconds...")
+                # wait, but keep checking that self._stop has not been set
+                end = time.monotonic() + delay
+                while (not self._stop) and (time.monotonic() < end):
+                    await asyncio.sleep(min(0.5, max(end - time.monotonic(), 0)))
+        except Exception:
+            logger.exception("Exception report from IClient._comms method")
+            raise
+        finally:
+            await self._clear_connection()
+            self.shutdown()
+
+    async def _clear_connection(self):
+        """As IPyClient._clear_connection, but the devices are kept, and those shown are
+           marked as stale"""
+        writer = self._writer
+        self.tx_timer = None
+        self._writer = None
+        self._reader = None
+        if writer is None:
+            return
+        try:
+            await self.warning(f"Connection closed on {self.indihost}:{self.indiport}")
+            await self.rxevent(events.ConnectionLost())
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            logger.exception("Exception report from IClient._clear_connection method")
+        if not self._stop:
+            self.mark_stale()
+
+    async def load_cache(self):
+        """Define the devices saved in the cache file when the terminal last exited, and
+           mark them as stale, they are then reconciled with the definitions received
+           from the server, as after a lost connection"""
+        loop = asyncio.get_running_loop()
+        path = self.clientdata['cachefile']
+        elements = await loop.run_in_executor(None, read_cache, path)
+        if not elements:
+            return
+        for count, element in enumerate(elements):
+            if self._stop:
+                return
+            await self._rxhandler(element)
+            if not count % 100:
+                # let the display be updated
+                await asyncio.sleep(0)
+        if self.shown:
+            timeline.mark("cache shown")
+            self.mark_stale()
+            await self.warning(f"Showing {len(self.shown)} devices saved from the last session, until defined by {self.indihost}:{self.indiport}")
+
+    async def save_cache(self):
+        "Save the devices to the cache file, if one is given, called when the client has stopped"
+        path = self.clientdata.get('cachefile')
+        if not path:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, save_cache, self, path)
+        except OSError:
+            logger.exception(f"Unable to save the cache file {path}")
+
+    def is_stale(self, devicename, vectorname=None):
+        "Return True if the device, or vector, has not been defined again since the connection was lost"
+        return (devicename, vectorname) in self.stale
+
+    def mark_stale(self, devicenames=None):
+        "Mark the given devices, or if None all devices shown, and their vectors, as stale"
+        app = self.clientdata['app']
+        serverid = self.clientdata['serverid']
+        if devicenames is None:
+            devicenames = list(self.shown)
+        for devicename in devicenames:
+            self.stale.add((devicename, None))
+            for vectorname in self[devicename]:
+                if (devicename, vectorname) not in self.defined:
+                    continue
+                self.stale.add((devicename, vectorname))
+                vectorpane = app.registry.get_pane(serverid, devicename, vectorname)
+                if vectorpane is not None:
+                    vectorpane.add_class("stale")
+        device_pane = app.get_screen('startsc').query_one("#device-pane")
+        device_pane.post_message(device_pane.SetStale(serverid, devicenames, True))
+        self._update_titles(devicenames)
+
+    def start_sweep(self):
+        "Start the task which removes stale devices and vectors, if it is not already running"
+        if (self._sweeper is None) or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_stale())
+
+    async def _sweep_stale(self):
+        """Wait until no definitions have been received for RECONCILE_QUIET seconds, then
+           remove the stale devices and vectors, as the server has not defined them again"""
+        started = time.monotonic()
+        try:
+            while self.stale and self.connected and (not self._stop):
+                await asyncio.sleep(0.5)
+                now = time.monotonic()
+                if self._lastdefine > started:
+                    if now - self._lastdefine < self.RECONCILE_QUIET:
+                        continue
+                elif now - started < self.RECONCILE_WAIT:
+                    continue
+                stale = sorted(self.stale, key=lambda key: (key[0], key[1] or ""))
+                devicenames = set(key[0] for key in stale if key[1] is None)
+                self._sweeping = True
+                try:
+                    for devicename, vectorname in stale:
+                        device = self.get(devicename)
+                        if device is None:
+                            continue
+                        if devicename not in devicenames:
+                            # delete the vector, as the server would
+                            await self._rxhandler(ET.Element("delProperty", device=devicename, name=vectorname))
+                        elif vectorname is not None:
+                            continue
+                        elif device.enable:
+                            await self._rxhandler(ET.Element("delProperty", device=devicename))
+                        else:
+                            # the device has already been deleted by the server
+                            self.remove_device(device)
+                finally:
+                    self._sweeping = False
+                self.stale.clear()
+                vectors = sum(1 for key in stale if key[0] not in devicenames)
+                await self.warning(f"Removed {len(devicenames)} devices and {vectors} vectors not defined again by {self.indihost}:{self.indiport}")
+        except Exception:
+            logger.exception("Exception report from IClient._sweep_stale method")
+
+    def remove_device(self, device, message="", timestamp=None):
+        "Remove the button, ids and screen of the device"
+        app = self.clientdata['app']
+        serverid = self.clientdata['serverid']
+        devicename = device.devicename
+        self.shown.pop(devicename, None)
+        self.stale = set(key for key in self.stale if key[0] != devicename)
+        self.defined = dict(item for item in self.defined.items() if item[0][0] != devicename)
+        app.searchindex.remove_device(serverid, devicename)
+        deviceid = app.itemid.get_devicid(serverid, devicename)
+        if not deviceid:
+            # This device is not displayed, nothing to do
+            return
+        startsc = app.get_screen('startsc')
+        # instruct the startsc to remove the device button
+        device_pane = startsc.query_one("#device-pane")
+        device_pane.post_message(device_pane.DelButton(deviceid))
+        if message:
+            # show this message as a system message, as there is no device
+            # so there is nowhere else to show it
+            messagelog = localtimestring(timestamp) + "  " + message
+            messages_pane  = startsc.query_one("#sys-messages-pane")
+            messages_pane.post_message(messages_pane.ShowLogs(messagelog))
+        # remove all id's associated with this device
+        app.itemid.clear_device(serverid, device)
+        app.renderer.discard(serverid, devicename)
+        # if this device is currently being shown, clear it
+        if (app.itemid.serverid == serverid) and (app.itemid.devicename == devicename):
+            self.clientdata['devicesc'] = None
+            app.itemid.set_device()
+        # and remove its screen, popping it if it is being shown
+        app.devicescreens.discard(serverid, devicename)
+
+    def unmark_stale(self, devicename, vectorname=None):
+        "The device, and vector if given, have been defined again, so are no longer stale"
+        app = self.clientdata['app']
+        serverid = self.clientdata['serverid']
+        if (devicename, None) in self.stale:
+            self.stale.discard((devicename, None))
+            device_pane = app.get_screen('startsc').query_one("#device-pane")
+            device_pane.post_message(device_pane.SetStale(serverid, [devicename], False))
+            self._update_titles([devicename])
+        if vectorname and ((devicename, vectorname) in self.stale):
+            self.stale.discard((devicename, vectorname))
+            vectorpane = app.registry.get_pane(serverid, devicename, vectorname)
+            if vectorpane is not None:
+                vectorpane.remove_class("stale")
+
+    def _update_titles(self, devicenames):
+        "Update the titles of the device screens of these devices, which show if the device is stale"
+        screens = list(self.clientdata['app'].devicescreens)
+        devicesc = self.clientdata.get('devicesc')
+        if (devicesc is not None) and (devicesc not in screens):
+            screens.append(devicesc)
+        serverid = self.clientdata['serverid']
+        for devicesc in screens:
+            if (devicesc.serverid == serverid) and (devicesc.devicename in devicenames):
+                devicesc.update_title()
+
+    async def hardware(self):
+        "Runs the BLOB connection, if one is used, alongside this client"
+        if self.blobclient is not None:
+            await self.blobclient.asyncrun()
+
+    def shutdown(self):
+        super().shutdown()
+        if self.blobclient is not None:
+            self.blobclient.shutdown()
+
+    async def send(self, xmldata):
+        "Transmits xmldata, waiting for any BLOB file being sent to complete"
+        async with self.sendlock:
+            await super().send(xmldata)
+
+    def enableBLOB_value(self, devicename, vectorname=None):
+        """Return the enableBLOB value to send for the device or vector. If a BLOB folder
+           is set this is taken from app.blobpolicy, otherwise BLOBs are not wanted.
+           If BLOBs are received on a second connection, they are not wanted on this one"""
+        if (not self.BLOBfolder) or (self.blobclient is not None):
+            return self.enableBLOBdefault
+        return self.clientdata['app'].blobpolicy.value(self.clientdata['serverid'], devicename, vectorname)
+
+    async def resend_enableBLOB(self, devicename, vectorname=None):
+        """Sends the enableBLOB value of app.blobpolicy for this device or vector,
+           called by IPyClient when a BLOB vector is defined or the BLOB folder changed"""
+        device = self.get(devicename)
+        if device is None:
+            return
+        if vectorname:
+            vector = device.get(vectorname)
+            if (vector is None) or (vector.vectortype != "BLOBVector"):
+                return
+            vector._enableBLOB = self.enableBLOB_value(devicename, vectorname)
+        else:
+            device._enableBLOB = self.enableBLOB_value(devicename)
+        await super().resend_enableBLOB(devicename, vectorname)
+
+    async def set_blobpolicy(self, value, devicename, vectorname=None):
+        """Set the enableBLOB value of the device or vector in app.blobpolicy, None
+           to use the value of the device or the default, and send it to the server"""
+        blobpolicy = self.clientdata['app'].blobpolicy
+        serverid = self.clientdata['serverid']
+        blobpolicy.set(value, serverid, devicename, vectorname)
+        if not self.BLOBfolder:
+            # sent when a BLOB folder is set
+            return
+        if self.blobclient is not None:
+            await self.blobclient.policychanged(devicename, vectorname)
+            return
+        await self.resend_enableBLOB(devicename, vectorname)
+        if vectorname is None:
+            # the server applies a device value to all its BLOB vectors, so
+            # send again the values of vectors which have their own
+            for name in blobpolicy.vectors(serverid, devicename):
+                await self.resend_enableBLOB(devicename, name)
+
+    def start_blobfile(self, vector, membername, path):
+        """Start sending the file at path as the BLOB member of the vector. The send
+           is run by an app worker, so continues if the member pane is removed"""
+        key = (vector.devicename, vector.name, membername)
+        if key in self.blobsends:
+            return
+        app = self.clientdata['app']
+        self.blobsends[key] = app.run_worker(self._send_blobfile(vector, membername, path),
+                                             group="blobsend", exit_on_error=False)
+
+    def sending_blobfile(self, vector, membername):
+        "Return True if a file is being sent to this member"
+        return (vector.devicename, vector.name, membername) in self.blobsends
+
+    def cancel_blobfile(self, vector, membername):
+        "Cancel a file being sent to this member, return True if one was being sent"
+        worker = self.blobsends.get((vector.devicename, vector.name, membername))
+        if worker is None:
+            return False
+        worker.cancel()
+        return True
+
+    async def _send_blobfile(self, vector, membername, path):
+        "Send the file, showing progress on the member pane, if it is displayed"
+        app = self.clientdata['app']
+        serverid = self.clientdata['serverid']
+        key = (vector.devicename, vector.name, membername)
+
+        def progress(sent, total, seconds):
+            memberpane = app.registry.get_pane(serverid, *key)
+            if memberpane is not None:
+                memberpane.show_sending(path.name, sent, total, seconds)
+
+        # imported when first used, as few sessions send files
+        from .blobtx import sendfile
+        result = "-- Not sent --"
+        try:
+            if await sendfile(self, vector, membername, path, progress):
+                result = ""
+                vector.member(membername).user_string = path.name
+                vectorpane = app.registry.get_pane(serverid, vector.devicename, vector.name)
+                if vectorpane is not None:
+                    vectorpane.set_busy()
+        except asyncio.CancelledError:
+            result = "-- Cancelled --"
+            raise
+        except OSError:
+            result = "-- Unable to read file --"
+        finally:
+            self.blobsends.pop(key, None)
+            memberpane = app.registry.get_pane(serverid, *key)
+            if memberpane is not None:
+                memberpane.show_sent(path.name, result)
+
+    async def _rxhandler(self, xmldata):
+        "If a BLOB folder is set, pass received BLOBs to self.blobreceiver, otherwise handle the data"
+        if (xmldata.tag == "setBLOBVector") and self.BLOBfolder and (xmldata.get("device") in self):
+            self.blobreceiver.receive(xmldata)
+            return
+        await super()._rxhandler(xmldata)
+
+    async def rxblob(self, xmldata, filenames):
+        """Called by self.blobreceiver when the BLOBs of a setBLOBVector have been saved,
+           filenames is a dictionary of membername to the filename saved"""
+        try:
+            try:
+                event = self[xmldata.get("device")].rxvector(xmldata)
+            except ParseException as pe:
+                await self.warning(str(pe))
+                return
+            for membername, filename in filenames.items():
+                event.vector.member(membername).filename = filename
+            await self.rxevent(event)
+        except Exception:
+            logger.exception("Exception report from IClient.rxblob method")
+
+    def blobprogress(self, devicename, vectorname, membername, done, total):
+        "Show the progress of a BLOB being saved"
+        app = self.clientdata['app']
+        serverid = self.clientdata['serverid']
+        if (serverid != app.itemid.serverid) or (devicename != app.itemid.devicename):
+            return
+        memberpane = app.registry.get_pane(serverid, devicename, vectorname, membername)
+        if memberpane is not None:
+            memberpane.show_progress(done, total)
 
     async def rxevent(self, event):
+        "Handle the event, recording the time taken in app.eventstats"
+        start = time.perf_counter()
+        if timeline.enabled:
+            if event.eventtype == "ConnectionMade":
+                timeline.mark("connected")
+            elif event.eventtype == "Define" or event.eventtype == "DefineBLOB":
+                timeline.mark("first Define")
+        try:
+            await self._rxevent(event)
+        finally:
+            self.clientdata['app'].eventstats.record(event.eventtype, time.perf_counter() - start)
+
+    async def _rxevent(self, event):
         app = self.clientdata['app']
+        serverid = self.clientdata['serverid']
         startsc = app.get_screen('startsc')
 
-        # if the connection is failed
-        # ensure the startsc is being shown
-        # and all device and vector id's are cleared
-
-        if (not self.connected) and app.itemid :
-            # the connection is disconnected
-            if not startsc.is_active:
-                app.push_screen('startsc')
-            device_pane = startsc.query_one("#device-pane")
-            device_pane.post_message(device_pane.ClearDevices())
-            app.itemid.clear()
-            self.clientdata['devicesc'] = None
+        # if the connection is failed, the devices are kept, and have been marked as stale
+        # by self._clear_connection, a definition received after reconnection removes the mark.
+        # A definition of a known vector is compared with its last definition, if unchanged
+        # its widgets are kept and only its values updated
+
+        # set True if this is a definition of a known vector, which changes how it is drawn
+        redefined = False
+        if (event.eventtype == "Define" or event.eventtype == "DefineBLOB"):
+            key = (event.devicename, event.vectorname)
+            signature = vector_signature(event.vector)
+            previous = self.defined.get(key)
+            redefined = (previous is not None) and (previous != signature)
+            if previous != signature:
+                # the names and labels searched are only indexed again if changed
+                app.searchindex.add_vector(serverid, event.vector)
+            self.defined[key] = signature
+            self._lastdefine = time.monotonic()
+            if self.stale:
+                self.unmark_stale(event.devicename, event.vectorname)
+        elif (event.eventtype == "Delete") and event.vectorname:
+            self.defined.pop((event.devicename, event.vectorname), None)
+            app.searchindex.remove_vector(serverid, event.devicename, event.vectorname)
+            self.stale.discard((event.devicename, event.vectorname))
 
         # handle received events affecting startsc ################################
 
         if (event.eventtype == "Define" or event.eventtype == "DefineBLOB"):
-            # does this device have an id
+            # has this device a button, or one been requested, its id is only set
+            # when the button is added, so is not checked here
             devicename = event.devicename
-            if not app.itemid.get_devicid(devicename):
+            if devicename not in self.shown:
                 # it doesn't, so add a button to the devicepane of startsc
                 device_pane = startsc.query_one("#device-pane")
-                device_pane.post_message(device_pane.NewButton(devicename))
+                device_pane.post_message(device_pane.NewButton(devicename, serverid))
+                self.shown[devicename] = event.device
                 # As this is a new device, its devicesc cannot be currently showing,
                 # but a message can be added to the device, which will appear on devicesc
                 event.device.messages.appendleft( (event.timestamp, f"Device discovered: {devicename}") )
@@ -214,26 +1469,18 @@ class IClient(ipc.IPyClient):
             # As the device has enable False, this Delete event is either requesting an entire
             # device delete, or the last vector of this device is deleted. In either
             # case, this entire device should be deleted
-            deviceid = app.itemid.get_devicid(event.devicename)
-            if not deviceid:
-                # This device is not displayed, nothing to do
+            if (not event.vectorname) and (not self._sweeping) and (event.devicename in self.shown):
+                # a driver which is restarted deletes its device and defines it again, so
+                # rather than removing its widgets, the device is marked as stale, and is
+                # only removed if it is not defined again
+                if event.message:
+                    messagelog = localtimestring(event.timestamp) + "  " + event.message
+                    messages_pane  = startsc.query_one("#sys-messages-pane")
+                    messages_pane.post_message(messages_pane.ShowLogs(messagelog))
+                self.mark_stale([event.devicename])
+                self.start_sweep()
                 return
-            # instruct the startsc to remove the device button
-            device_pane = startsc.query_one("#device-pane")
-            device_pane.post_message(device_pane.DelButton(deviceid))
-            if event.message:
-                # show this message as a system message, as there is no device
-                # so there is nowhere else to show it
-                messagelog = localtimestring(event.timestamp) + "  " + event.message
-                messages_pane  = startsc.query_one("#sys-messages-pane")
-                messages_pane.post_message(messages_pane.ShowLogs(messagelog))
-            # remove all id's associated with this device
-            app.itemid.clear_device(event.device)
-            # if this device is currently being shown, pop the screen
-            if app.itemid.devicename == event.devicename:
-                self.clientdata['devicesc'] = None
-                app.itemid.devicename = None
-                app.pop_screen()
+            self.remove_device(event.device, event.message, event.timestamp)
             return
 
 
@@ -252,8 +1499,9 @@ class IClient(ipc.IPyClient):
             # No device currently being shown
             return
 
-        if event.devicename != app.itemid.devicename:
-            # this event refers to a device not currently being shown
+        if (serverid != app.itemid.serverid) or (event.devicename != app.itemid.devicename):
+            # this event refers to a device not currently being shown, which may
+            # be a device of the same name on another server
             return
 
         devicename = app.itemid.devicename
@@ -264,7 +1512,7 @@ class IClient(ipc.IPyClient):
             if event.message:
                 messagelog = localtimestring(event.timestamp) + "  " + event.message
                 log = devicesc.query_one('#dev-messages-pane')
-                log.post_message(log.ShowLogs(messagelog))
+                log.post_message(log.ShowLogs(messagelog, event.timestamp))
             return
 
         if not event.vectorname:
@@ -273,6 +1521,13 @@ class IClient(ipc.IPyClient):
         vectorid = app.itemid.get_id(event.vectorname)
 
         if (event.eventtype == "Define" or event.eventtype == "DefineBLOB"):
+            if redefined:
+                # the vector is drawn differently, or is in another group, so only this
+                # vector is drawn again, its values will be taken from the vector
+                app.renderer.discard(serverid, devicename, event.vectorname)
+                grouppane = devicesc.query_one("#dev-group-pane")
+                grouppane.post_message(grouppane.ReconcileVector(event.vector))
+                return
             if vectorid is None:
                 # new vector, add the vector to the tab
                 vector = self[devicename][event.vectorname]
@@ -286,45 +1541,53 @@ class IClient(ipc.IPyClient):
                     grouppane.post_message(grouppane.AddGroup(vector.group))
                 return
 
-        if vectorid is None:
-            # no define has been received for this vector, it is not known about
-            # should a getproperties be sent here?
-            return
-
         if event.eventtype == "Delete":
-            # This vector should be deleted
+            # This vector should be deleted, its vectorid may be None if its
+            # group tab has not been shown, but the group may still need removing
             vector = self[devicename][event.vectorname]
             grouppane = devicesc.query_one("#dev-group-pane")
             grouppane.post_message(grouppane.DelVector(vector, vectorid))
+            app.renderer.discard(serverid, devicename, event.vectorname)
             # the delete event could include a message, which cannot be displayed on the vector
             # widget, since that will be removed, instead show it on the device message log
             if event.message:
                 messagelog = localtimestring(event.timestamp) + "  " + event.message
                 log = devicesc.query_one("#dev-messages-pane")
-                log.post_message(log.ShowLogs(messagelog))
+                log.post_message(log.ShowLogs(messagelog, event.timestamp))
+            return
+
+        if vectorid is None:
+            # no vector pane has been drawn for this vector, either its group tab has
+            # not yet been shown, or no define has been received for it. In either
+            # case the vector values are held in the client and will be drawn when
+            # the tab is shown
             return
 
         # so the vector is currently on display and has a vector pane. The received event may be setting new values
-        vectorpane = devicesc.query_one(f"#{vectorid}")
+
+        if event.eventtype == "TimeOut":
+            vectorpane = app.registry.get_pane(serverid, devicename, event.vectorname)
+            if vectorpane is None:
+                return
+            vectorpane.post_message(vectorpane.SubmitButtonmessage("A Timeout Error has occurred"))
+            if vectorpane.vstate == "Busy":
+                app.renderer.set_vector(serverid, devicename, event.vectorname, localtimestring(event.timestamp), "Alert")
+            return
+
+        # Changes to the vector pane are not posted directly, but recorded in app.renderer
+        # which keeps only the latest values, and applies them at a limited frame rate
+
+        timestring = localtimestring(event.timestamp)
 
         # Display vector state with timestamp
         if hasattr(event, "state"):
             # shows timestamp and state together
-            vectorpane.post_message(vectorpane.ShowTimestamp(localtimestring(event.timestamp)))
-            vectorpane.post_message(vectorpane.ShowState(event.state))
+            app.renderer.set_vector(serverid, devicename, event.vectorname, timestring, event.state)
 
         # Display vector message
         if hasattr(event, "message"):
             if event.message:
-                vectorpane.post_message(vectorpane.ShowVmessage(localtimestring(event.timestamp) + "  " + event.message))
-
-        if event.eventtype == "TimeOut":
-            vectorpane.post_message(vectorpane.SubmitButtonmessage("A Timeout Error has occurred"))
-            if vectorpane.vstate == "Busy":
-                vectorpane.post_message(vectorpane.ShowTimestamp(localtimestring(event.timestamp)))
-                vectorpane.post_message(vectorpane.ShowState("Alert"))
-            return
-
+                app.renderer.set_message(serverid, devicename, event.vectorname, timestring, event.message)
 
         if event.eventtype not in ("Define", "DefineBLOB", "Set", "SetBLOB"):
             return
@@ -334,33 +1597,121 @@ class IClient(ipc.IPyClient):
         if event.vector.vectortype == "SwitchVector" and event.vector.rule == "OneOfMany":
             # this is treated differently from the others as each member has not been
             # drawn in its own memberpane, rather all the members are drawn in a special
-            # radiomembers container holding a textual radioset.
-            # whenever a change is received, ask for this radiomembers to be recomposed
-            radiomembers = vectorpane.query_one("RadioMembers")
-            radiomembers.post_message(radiomembers.ResetValue())
+            # radiomembers container holding a textual radioset or select.
+            # whenever a change is received, ask for this radiomembers to be updated
+            changed = False
+            for membername in event:
+                if app.renderer.member_changed(serverid, devicename, event.vectorname, membername, event.vector[membername]):
+                    changed = True
+            if changed:
+                app.renderer.reset_radio(serverid, devicename, event.vectorname)
             return
 
 
-        # For every member in the event, display its value
+        # For every member in the event, record its value to be displayed
 
-        for membername, membervalue in event.items():
-            mpid = app.itemid.get_id(event.vectorname, membername)
-            if not mpid:
-                # This member not defined
-                continue
-            memberpane = vectorpane.query_one(f"#{mpid}")
-            if event.vector.vectortype == "SwitchVector":
-                memberpane.post_message(memberpane.SetValue(membervalue))
-            elif event.vector.vectortype == "LightVector":
-                memberpane.post_message(memberpane.SetValue(membervalue))
-            elif event.vector.vectortype == "TextVector":
-                memberpane.post_message(memberpane.SetValue(membervalue))
-            elif event.vector.vectortype == "NumberVector":
-                # display a formatted number string rather than the received number
-                fvalue = event.vector.getformattedvalue(membername)
-                memberpane.post_message(memberpane.SetValue(fvalue))
-            elif event.vector.vectortype == "BLOBVector":
-                # display the received filename rather than the binary blob received
-                # the vector.member() method returns the member given its name
-                fvalue = event.vector.member(membername).filename
-                memberpane.post_message(memberpane.SetValue(fvalue))
+        renderer = app.renderer
+        if event.vector.vectortype == "BLOBVector":
+            # a BLOB is always shown, as a new BLOB is received even if its contents are unchanged
+            for membername in event:
+                renderer.set_member(serverid, devicename, event.vectorname, membername, displayvalue(event.vector, membername))
+            return
+
+        for membername in event:
+            # skip formatting and displaying values which have not changed
+            if renderer.member_changed(serverid, devicename, event.vectorname, membername, event.vector[membername]):
+                renderer.set_member(serverid, devicename, event.vectorname, membername, displayvalue(event.vector, membername))
+
+
+
+class BLOBClient(XMLInput, ipc.IPyClient):
+    """A second connection to the INDI server, used to receive BLOBs, so other values,
+       received by the IClient connection, are not held up behind a large BLOB.
+
+       Every device is set to enableBLOB Only on this connection, so the server sends
+       nothing else on it, and each BLOB vector is set to Only or Never, following
+       app.blobpolicy. Received BLOBs are passed to the blobreceiver of the IClient,
+       which sets them into its devices, and handles them as its own events."""
+
+    def __init__(self, iclient):
+        super().__init__(indihost=iclient.indihost, indiport=iclient.indiport)
+        self.iclient = iclient
+        # the server does not answer a getProperties on this connection, so do not time out
+        self.timeout_enable = False
+        # names of the devices set to Only on this connection
+        self._onlydevices = set()
+
+    def folderchanged(self):
+        "Called when the BLOB folder of the IClient changes, to send the enableBLOB values again"
+        self._blobfolderchanged = True
+
+    async def warning(self, message):
+        "Show warnings of this connection as messages of the IClient"
+        await self.iclient.warning(f"BLOB connection: {message}")
+
+    async def _rxhandler(self, xmldata):
+        """Pass BLOBs to the IClient, and learn devices and vectors from their definitions.
+           Anything else received is ignored"""
+        if xmldata.tag == "setBLOBVector":
+            iclient = self.iclient
+            if iclient.BLOBfolder and (xmldata.get("device") in iclient):
+                iclient.blobreceiver.receive(xmldata)
+            return
+        if xmldata.tag.startswith("def"):
+            devicename = xmldata.get("device")
+            if devicename and (devicename not in self._onlydevices):
+                # stop the server sending anything but BLOBs of this device
+                self._onlydevices.add(devicename)
+                enable = ET.Element('enableBLOB', device=devicename)
+                enable.text = "Only"
+                await self.send(enable)
+        elif xmldata.tag == "delProperty":
+            if not xmldata.get("name"):
+                # the whole device is deleted
+                self._onlydevices.discard(xmldata.get("device"))
+        else:
+            return
+        await super()._rxhandler(xmldata)
+
+    async def rxevent(self, event):
+        if event.eventtype in ("ConnectionMade", "ConnectionLost"):
+            # devices are learnt again on each connection
+            self._onlydevices.clear()
+
+    def enableBLOB_value(self, devicename, vectorname=None):
+        "Return Only if the IClient wants BLOBs of this vector, otherwise Never"
+        iclient = self.iclient
+        if vectorname is None:
+            return "Only"
+        if not iclient.BLOBfolder:
+            return "Never"
+        if iclient.clientdata['app'].blobpolicy.value(iclient.clientdata['serverid'], devicename, vectorname) == "Never":
+            return "Never"
+        return "Only"
+
+    async def resend_enableBLOB(self, devicename, vectorname=None):
+        """Sends the enableBLOB value for this device or vector, called by IPyClient
+           when a BLOB vector is defined or the BLOB folder changed"""
+        device = self.get(devicename)
+        if device is None:
+            return
+        if vectorname:
+            vector = device.get(vectorname)
+            if (vector is None) or (vector.vectortype != "BLOBVector"):
+                return
+            vector._enableBLOB = self.enableBLOB_value(devicename, vectorname)
+        else:
+            device._enableBLOB = self.enableBLOB_value(devicename)
+        await super().resend_enableBLOB(devicename, vectorname)
+
+    async def policychanged(self, devicename, vectorname=None):
+        "Send the enableBLOB value of the vector, or of every BLOB vector of the device"
+        device = self.get(devicename)
+        if device is None:
+            return
+        if vectorname:
+            await self.resend_enableBLOB(devicename, vectorname)
+            return
+        for vector in list(device.values()):
+            if vector.vectortype == "BLOBVector":
+                await self.resend_enableBLOB(devicename, vector.name)
@@ -4,16 +4,23 @@ import pathlib
 from textual.app import App
 from textual import on
 from textual.app import ComposeResult
-from textual.widgets import Footer, Static, Button, Log, Input
+from textual.widgets import Footer, Static, Button, Input
 from textual.screen import Screen
-from textual.containers import Container, HorizontalScroll, VerticalScroll, Center, Horizontal
+from textual.containers import Container, HorizontalScroll, VerticalScroll, Center, Horizontal, Vertical
 from textual.message import Message
 
-from .iclient import ItemID, IClient, localtimestring
+from .iclient import ItemID, IClient, WidgetRegistry, RenderScheduler, EventStats, BLOBPolicy, SearchIndex
 
-from .devicesc import DeviceSc
+from .messagelog import MessageLog
 
-version = "0.1.4"
+from .cache import cachepath
+
+from .version import version
+
+from .timeline import timeline
+
+# the device screen modules, with the vector and member widgets, and the statistics
+# and find screens, are imported when first used, so the start screen is shown sooner
 
 
 
@@ -34,20 +41,48 @@ class DevicePane(VerticalScroll):
                 padding: 1;
                 }
 
-             DevicePane > Button {
+            DevicePane > Vertical {
+                height: auto;
+                }
+
+            DevicePane .servername {
+                color: $text-muted;
+                text-style: bold;
+                }
+
+             DevicePane Button {
                 width: 100%;
                 }
+
+             DevicePane Button.stale {
+                text-style: italic;
+                text-opacity: 60%;
+                }
         """
 
     class NewButton(Message):
         """Add a new button."""
 
-        def __init__(self, devicename: str) -> None:
+        def __init__(self, devicename: str, serverid: str) -> None:
             self.devicename = devicename
+            self.serverid = serverid
             super().__init__()
 
     class ClearDevices(Message):
-        pass
+        """Remove the buttons of the devices of a server."""
+
+        def __init__(self, serverid: str) -> None:
+            self.serverid = serverid
+            super().__init__()
+
+    class SetStale(Message):
+        """Show the buttons of these devices of a server as stale, or no longer stale."""
+
+        def __init__(self, serverid: str, devicenames: list, stale: bool) -> None:
+            self.serverid = serverid
+            self.devicenames = devicenames
+            self.stale = stale
+            super().__init__()
 
     class DelButton(Message):
         """Delete a button."""
@@ -57,56 +92,97 @@ class DevicePane(VerticalScroll):
             super().__init__()
 
     def compose(self):
+        """The buttons of each server's devices are held in a Vertical container with the
+           id of the server, headed by the server name if there is more than one server"""
         self.border_title = "Devices"
-        if self.app.indiclient is None:
-            devices = 0
-        else:
-            devices = self.app.indiclient.enabledlen()
         # The number of enabled devices
+        devices = sum(iclient.enabledlen() for iclient in self.app.indiclients)
         if not devices:
             yield Static("No Devices found", id="no-devices")
-        else:
-            for devicename in self.app.indiclient:
-                deviceid = self.app.itemid.set_devicid(devicename)
-                yield Button(devicename, variant="primary", classes="devices", id=deviceid)
+        for iclient in self.app.indiclients:
+            serverid = iclient.clientdata['serverid']
+            with Vertical(id=serverid):
+                if len(self.app.indiclients) > 1:
+                    yield Static(f"{iclient.indihost}:{iclient.indiport}", classes="servername")
+                for devicename in iclient:
+                    deviceid = self.app.itemid.set_devicid(serverid, devicename)
+                    button = Button(devicename, variant="primary", classes="devices", id=deviceid)
+                    button.set_class(iclient.is_stale(devicename), "stale")
+                    yield button
 
 
     def on_device_pane_new_button(self, message: NewButton) -> None:
         devicename = message.devicename
-        deviceid = self.app.itemid.set_devicid(devicename)
+        servers = self.query(f"#{message.serverid}")
+        if not servers:
+            # the server is no longer connected
+            return
+        deviceid = self.app.itemid.set_devicid(message.serverid, devicename)
+        if self.query(f"#{deviceid}"):
+            # the button was drawn when this pane was composed
+            return
         self.remove_children("#no-devices")
-        self.mount(Button(devicename, variant="primary", classes="devices", id=deviceid))
+        servers.first().mount(Button(devicename, variant="primary", classes="devices", id=deviceid))
 
     def on_device_pane_clear_devices(self, message: ClearDevices) -> None:
-        if self.query(".devices"):
-            self.remove_children(".devices")
-            self.mount(Static("No Devices found", id="no-devices"))
+        servers = self.query(f"#{message.serverid}")
+        if not servers:
+            return
+        server = servers.first()
+        remaining = list(button for button in self.query(".devices") if button.parent is not server)
+        server.remove_children(".devices")
+        if not (remaining or self.query("#no-devices")):
+            self.mount(Static("No Devices found", id="no-devices"), before=0)
+
+    def on_device_pane_set_stale(self, message: SetStale) -> None:
+        for devicename in message.devicenames:
+            deviceid = self.app.itemid.get_devicid(message.serverid, devicename)
+            if deviceid:
+                self.query(f"#{deviceid}").set_class(message.stale, "stale")
 
     def on_device_pane_del_button(self, message: DelButton) -> None:
         deviceid = message.deviceid
-        self.remove_children(f"#{deviceid}")
+        self.query(f"#{deviceid}").remove()
 
 
     @on(Button.Pressed, ".devices")
     def choose_device(self, event):
         "Choose device from the button pressed"
-        iclient = self.app.indiclient
-        if iclient is None:
-            return
-        devicename = self.app.itemid.get_devicename(event.button.id)
-        if not devicename:
+        device = self.app.itemid.get_device(event.button.id)
+        if not device:
             return
-        if devicename not in iclient:
+        self.show_device(*device)
+
+    def show_device(self, serverid, devicename):
+        """Show the screen of the device of the client with this serverid, returning it,
+           or None if the device is not shown"""
+        iclient = self.app.get_client(serverid)
+        if (iclient is None) or (devicename not in iclient):
             # An unknown device
             return
         if not iclient[devicename].enable:
             # This device is disabled
             return
-        # create a device screen, and store a reference to it
-        # in the indiclient 'cliendata' dictionary
-        iclient.clientdata['devicesc'] = DeviceSc(devicename)
+        # values received while the device was not shown were not recorded by the renderer,
+        # so its last values are forgotten, and will be taken from the next events received
+        self.app.renderer.forget(serverid, devicename)
+        # use a recently shown device screen if one is kept, otherwise create one
+        devicesc = self.app.devicescreens.get(serverid, devicename)
+        if devicesc is None:
+            from .devicesc import DeviceSc
+            devicesc = DeviceSc(serverid, devicename)
+            self.app.devicescreens.add(devicesc)
+        else:
+            self.app.itemid.set_device(serverid, devicename)
+            devicesc.resync()
+        # store a reference to it in the 'cliendata' dictionary of the client of
+        # this device, a device of any other client is no longer shown
+        for client in self.app.indiclients:
+            client.clientdata['devicesc'] = None
+        iclient.clientdata['devicesc'] = devicesc
         # push the devicesc to the top of the stack
-        self.app.push_screen(iclient.clientdata['devicesc'])
+        self.app.push_screen(devicesc)
+        return devicesc
 
 
 class BlobPane(HorizontalScroll):
@@ -149,10 +225,9 @@ class BlobInput(Input):
             self.insert_text_at_cursor(str(self.app.blobfolder))
 
     def on_blur(self, event):
-        iclient = self.app.indiclient
         if not self.value:
             self.app.blobfolder = None
-            if iclient is not None:
+            for iclient in self.app.indiclients:
                 iclient.BLOBfolder = None
             self.clear()
             self.insert_text_at_cursor('')
@@ -162,7 +237,7 @@ class BlobInput(Input):
         blobfolder = pathlib.Path(self.value).expanduser().resolve()
         if not blobfolder.is_dir():
             self.app.blobfolder = None
-            if iclient is not None:
+            for iclient in self.app.indiclients:
                 iclient.BLOBfolder = None
             self.clear()
             self.insert_text_at_cursor('Invalid Folder')
@@ -170,7 +245,7 @@ class BlobInput(Input):
             return
 
         self.app.blobfolder = blobfolder
-        if iclient is not None:
+        for iclient in self.app.indiclients:
             iclient.BLOBfolder = blobfolder
         self.clear()
         self.insert_text_at_cursor(str(blobfolder))
@@ -192,7 +267,7 @@ class MessagesPane(Container):
             border: mediumvioletred;
             }
 
-        MessagesPane > Log {
+        MessagesPane > MessageLog {
             width: 100%;
             background: $panel;
             scrollbar-background: $panel;
@@ -209,20 +284,11 @@ class MessagesPane(Container):
 
     def compose(self):
         self.border_title = "System Messages"
-        yield Log(id="system-messages")
+        yield MessageLog(capacity=self.app.loglines, id="system-messages")
 
     def on_messages_pane_show_logs(self, message: ShowLogs) -> None:
         log = self.query_one("#system-messages")
-        if log.line_count < 32:
-            log.write_line(message.messagelog)
-            return
-        # if greater than 32, clear logs, and show the last eight
-        # stored as a deque in indiclient
-        log.clear()
-        if self.app.indiclient is not None:
-            messages = list(self.app.indiclient.messages)
-            mlist = reversed([ localtimestring(t) + "  " + m for t,m in messages ])
-            log.write_lines(mlist)
+        log.write_line(message.messagelog)
 
 
 
@@ -257,13 +323,13 @@ class ConnectionPane(Container):
                 con_status.update("Host:Port not set")
                 con_button.disabled = True
             else:
-                con_status.update(f"Current server : {self.app.indihost}:{self.app.indiport}")
+                con_status.update(self.status_text())
                 con_button.disabled = False
         else:
             # An indiclient instance exists, disable the input field
             # and set the button to 'Disconnect"
             con_input.disabled = True
-            con_status.update(f"Current server : {self.app.indiclient.indihost}:{self.app.indiclient.indiport}")
+            con_status.update(self.status_text())
             con_button.label = "Disconnect"
             con_button.disabled = False
         yield con_input
@@ -272,32 +338,43 @@ class ConnectionPane(Container):
             yield con_button
 
 
+    def status_text(self):
+        "Return the text showing the current server, or servers"
+        if self.app.indiclients:
+            servers = list(f"{iclient.indihost}:{iclient.indiport}" for iclient in self.app.indiclients)
+        else:
+            servers = list(f"{host}:{port}" for host, port in self.app.hostports())
+        if len(servers) == 1:
+            return f"Current server : {servers[0]}"
+        return "Current servers : " + ", ".join(servers)
+
+
     async def on_button_pressed(self, event):
         con_input = self.query_one("#con-input")
         con_status = self.query_one("#con-status")
         con_button = self.query_one("#con-button")
+        device_pane = self.screen.query_one("#device-pane")
         if self.app.indiclient is None:
             # call for connection
-            # create an indiclient
-            self.app.indiclient = IClient(indihost=self.app.indihost, indiport=self.app.indiport, app=self.app)
-            if self.app.blobfolder:
-                self.app.indiclient.BLOBfolder = self.app.blobfolder
+            # create a client for each server
+            self.app.indiclients = self.app.new_clients()
             con_input.disabled = True
-            con_status.update(f"Current server : {self.app.indiclient.indihost}:{self.app.indiclient.indiport}")
+            con_status.update(self.status_text())
             con_button.label = "Disconnect"
             con_button.disabled = False
             # clear the messages pane
-            mess_pane = self.parent.query_one("#sys-messages-pane")
+            mess_pane = self.screen.query_one("#sys-messages-pane")
             log = mess_pane.query_one("#system-messages")
             log.clear()
-            # and run indiclient.asyncrun()
-            self.app.run_worker(self.app.indiclient.asyncrun(), exclusive=True)
+            # draw a container for the device buttons of each server
+            await device_pane.recompose()
+            # and run the asyncrun() method of each client
+            self.app.start_clients()
         else:
             # call for disconnection
-            self.app.indiclient.shutdown()
-            # and wait for it to shutdown
-            await self.app.indiclient.stopped.wait()
-            self.app.indiclient = None
+            # and wait for the clients to shutdown
+            await self.app.stop_clients()
+            self.app.indiclients = []
             con_input.disabled = False
             con_status.update("Host:Port not set")
             con_button.label = "Connect"
@@ -305,20 +382,20 @@ class ConnectionPane(Container):
                 con_status.update("Host:Port not set")
                 con_button.disabled = True
             else:
-                con_status.update(f"Current server : {self.app.indihost}:{self.app.indiport}")
+                con_status.update(self.status_text())
                 con_button.disabled = False
             # clear the list of device buttons
-            device_pane = self.parent.query_one("#device-pane")
-            if device_pane.query(".devices"):
-                device_pane.remove_children(".devices")
-                device_pane.mount(Static("No Devices found", id="no-devices"))
+            await device_pane.recompose()
             # clear the messages pane, leving a single 'DISCONNECTED' message
-            mess_pane = self.parent.query_one("#sys-messages-pane")
+            mess_pane = self.screen.query_one("#sys-messages-pane")
             log = mess_pane.query_one("#system-messages")
             log.clear()
             log.write_line("DISCONNECTED")
             # and clear all item id's
             self.app.itemid.clear()
+            self.app.renderer.clear()
+            self.app.devicescreens.clear()
+            self.app.searchindex.clear()
 
 
 
@@ -400,18 +477,86 @@ class StartSc(Screen):
         yield Footer()
 
 
+class DeviceScreens():
+    """Keeps up to maxsize recently used device screens installed, so they are
+       not destroyed when popped, and can be shown again without being recomposed.
+       The least recently used screen is removed when the maximum is exceeded."""
+
+    def __init__(self, app, maxsize=4):
+        self.app = app
+        self.maxsize = maxsize
+        # (serverid, devicename) to DeviceSc, the most recently used last
+        self._screens = {}
+        # used to create unique screen names
+        self._count = 0
+
+    def __len__(self):
+        return len(self._screens)
+
+    def __iter__(self):
+        "Iterate over the screens kept"
+        return iter(list(self._screens.values()))
+
+    def get(self, serverid, devicename):
+        "Return the screen of this device, marking it as most recently used, or None if not kept"
+        devicesc = self._screens.pop((serverid, devicename), None)
+        if devicesc is not None:
+            self._screens[serverid, devicename] = devicesc
+        return devicesc
+
+    def add(self, devicesc):
+        "Install this screen, and remove the least recently used if there are too many"
+        if self.maxsize < 1:
+            return
+        self._count += 1
+        self.app.install_screen(devicesc, f"devicesc{self._count}")
+        self._screens[devicesc.serverid, devicesc.devicename] = devicesc
+        while len(self._screens) > self.maxsize:
+            oldest = next(iter(self._screens))
+            self.discard(*oldest)
+
+    def discard(self, serverid, devicename):
+        """Uninstall and remove the screen of this device. If it is on the screen stack it is
+           popped, together with any screens above it, such as the statistics or find screens"""
+        devicesc = self._screens.pop((serverid, devicename), None)
+        if devicesc is None:
+            # with a maxsize of zero the screen shown is not kept, but is on the stack
+            for screen in self.app.screen_stack:
+                if (getattr(screen, "serverid", None) == serverid) and (getattr(screen, "devicename", None) == devicename):
+                    devicesc = screen
+                    break
+            else:
+                return
+        if devicesc in self.app.screen_stack:
+            while devicesc in self.app.screen_stack:
+                self.app.pop_screen()
+            # as it is no longer installed, the pop will remove it
+            self.app.uninstall_screen(devicesc)
+            return
+        self.app.uninstall_screen(devicesc)
+        devicesc.remove()
+
+    def clear(self):
+        for serverid, devicename in list(self._screens):
+            self.discard(serverid, devicename)
+
+
+
 class IPyTerm(App):
     """An INDI terminal."""
 
     SCREENS = {"startsc": StartSc}
 
-    BINDINGS = [("q", "quit", "Quit"), ("d", "toggle_dark", "Toggle dark mode")]
+    BINDINGS = [("q", "quit", "Quit"), ("d", "toggle_dark", "Toggle dark mode"), ("s", "stats", "Statistics"), ("slash,ctrl+f", "find", "Find")]
 
     ENABLE_COMMAND_PALETTE = False
 
-    def __init__(self, host="localhost", port=7624, blobfolder=None):
+    def __init__(self, host="localhost", port=7624, blobfolder=None, framerate=20, screencache=4, loglines=200, maxradio=8, blobpolicy=(), blobconnection=False, replay=None, speed=1.0, servers=(), cache=True):
         self.indihost = host
         self.indiport = port
+        # further servers, a list of (host, port), connected to at the same time as host and port,
+        # the devices of each server are kept apart, so servers may have devices of the same name
+        self.servers = list(servers)
         if blobfolder:
             bf = pathlib.Path(blobfolder).expanduser().resolve()
             if bf.is_dir():
@@ -420,29 +565,150 @@ class IPyTerm(App):
                 self.blobfolder = None
         else:
             self.blobfolder = None
+        # the number of lines kept by the system and device message logs
+        self.loglines = loglines
+        # OneOfMany vectors with more members than this are shown as a drop down list
+        self.maxradio = maxradio
+        # enableBLOB values chosen for devices and vectors, a list of (devicename, vectorname, value)
+        # may be given, with vectorname None to set the value of a device, these apply on every server
+        self.blobpolicy = BLOBPolicy(blobpolicy)
+        # if True, BLOBs are received on a second connection to the server
+        self.blobconnection = blobconnection
+        # if a recording is given, it is replayed rather than connecting to host and port,
+        # at the given speed, or as fast as possible if speed is zero
+        self.replay = pathlib.Path(replay) if replay else None
+        self.speed = speed
+        # if True, the devices of each server are saved on exit, and shown on the next start
+        # until the server defines them, a replay is not cached
+        self.cache = cache and (not self.replay)
         self.itemid = ItemID()
-        self.indiclient = IClient(indihost=host, indiport=port, app=self)
-        if self.blobfolder:
-            self.indiclient.BLOBfolder = self.blobfolder
+        # maps device, vector and member names to the mounted widgets
+        self.registry = WidgetRegistry()
+        # changes to displayed vectors are applied at no more than framerate times a second
+        self.renderer = RenderScheduler(self, framerate)
+        # recently shown device screens are kept for fast switching between devices
+        self.devicescreens = DeviceScreens(self, screencache)
+        # counts of events received, shown on the statistics screen
+        self.eventstats = EventStats()
+        # the names and labels of every vector, searched by the find screen
+        self.searchindex = SearchIndex()
+        # a client for each server, an empty list if disconnected
+        self.indiclients = self.new_clients()
         super().__init__()
 
+    @property
+    def indiclient(self):
+        "The client of the first server, or None if disconnected"
+        if self.indiclients:
+            return self.indiclients[0]
+
+    def hostports(self):
+        "Return a list of (host, port) of each server"
+        return [(self.indihost, self.indiport)] + self.servers
+
+    def new_clients(self):
+        """Return a list of new clients, connecting to self.indihost and self.indiport and to
+           each of self.servers, or a single client replaying self.replay. Each is given a
+           serverid, which is the id of the container of its device buttons"""
+        if self.replay:
+            from .replay import ReplayClient
+            clients = [ReplayClient(self.replay, self.speed, app=self, serverid="server0")]
+        else:
+            clients = list(IClient(indihost=host, indiport=port, app=self, serverid=f"server{index}",
+                                   cachefile=cachepath(host, port) if self.cache else None)
+                           for index, (host, port) in enumerate(self.hostports()))
+        if self.blobfolder:
+            for iclient in clients:
+                iclient.BLOBfolder = self.blobfolder
+        return clients
+
+    def start_clients(self):
+        """Run each client in its own worker, so they connect in parallel, and a server
+           which is slow or not responding does not delay the others"""
+        for iclient in self.indiclients:
+            self.run_worker(iclient.asyncrun(), group="indiclients")
+
+    async def stop_clients(self):
+        "Shutdown the clients, wait for them to stop, and save their devices to the cache"
+        for iclient in self.indiclients:
+            iclient.shutdown()
+        for iclient in self.indiclients:
+            await iclient.stopped.wait()
+            iclient.blobreceiver.shutdown()
+            await iclient.save_cache()
+
+    def get_client(self, serverid):
+        "Return the client with this serverid, or None if there is no such client"
+        for iclient in self.indiclients:
+            if iclient.clientdata['serverid'] == serverid:
+                return iclient
+
+    def get_device(self, serverid, devicename):
+        "Return the device of the client with this serverid, raising KeyError if it has no such device"
+        iclient = self.get_client(serverid)
+        if iclient is None:
+            raise KeyError(devicename)
+        return iclient[devicename]
+
 
     def on_mount(self) -> None:
-        """Start the worker which runs self.indiclient.asyncrun()
+        """Start the workers which run the clients
            and show the start screen"""
         self.push_screen('startsc')
-        self.run_worker(self.indiclient.asyncrun(), exclusive=True)
+        self.call_after_refresh(timeline.mark, "first paint")
+        self.start_clients()
 
 
 
     async def action_quit(self) -> None:
         """An action to quit the program."""
-        if self.indiclient is not None:
-            self.indiclient.shutdown()
-            # and wait for it to shutdown
-            await self.indiclient.stopped.wait()
+        await self.stop_clients()
         self.exit(0)
 
+    def action_stats(self) -> None:
+        """Show the statistics screen, or return from it if it is being shown."""
+        from .statssc import StatsSc
+        if isinstance(self.screen, StatsSc):
+            self.pop_screen()
+        else:
+            self.push_screen(StatsSc())
+
+    def action_find(self) -> None:
+        """Show the find screen, and show the vector chosen on it"""
+        from .searchsc import SearchSc
+        if isinstance(self.screen, SearchSc):
+            return
+        self.push_screen(SearchSc(), self.show_vector)
+
+    def show_vector(self, found):
+        """Show the device screen of the vector found, given as (serverid, devicename, vectorname),
+           at the tab of its group, scrolled to the vector"""
+        if found is None:
+            return
+        serverid, devicename, vectorname = found
+        iclient = self.get_client(serverid)
+        if (iclient is None) or (devicename not in iclient) or (not iclient[devicename].enable):
+            self.notify(f"{devicename} is no longer defined")
+            return
+        vector = iclient[devicename].get(vectorname)
+        if (vector is None) or (not vector.enable):
+            self.notify(f"{vectorname} is no longer defined")
+            return
+        from .devicesc import DeviceSc
+        if isinstance(self.screen, DeviceSc) and (self.screen.serverid == serverid) and (self.screen.devicename == devicename):
+            self.screen.show_vector(vectorname)
+            return
+        # return to the start screen, and choose the device from it
+        startsc = self.get_screen('startsc')
+        while self.screen is not startsc:
+            if isinstance(self.screen, DeviceSc):
+                self.screen.action_main()
+            else:
+                self.pop_screen()
+        devicesc = startsc.query_one("#device-pane").show_device(serverid, devicename)
+        if devicesc is not None:
+            devicesc.show_vector(vectorname)
+
     def action_toggle_dark(self) -> None:
         """An action to toggle dark mode."""
         self.theme = (
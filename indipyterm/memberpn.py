@@ -1,6 +1,6 @@
 from rich.text import Text
 
-from textual.widgets import Static, Button, Input, Switch, RadioButton, RadioSet
+from textual.widgets import Static, Button, Input, Switch, RadioButton, RadioSet, Select, ProgressBar
 from textual.reactive import reactive
 from textual.containers import Container
 from textual.message import Message
@@ -98,15 +98,25 @@ class TextMemberPane(Widget):
             self.value = value
             super().__init__()
 
+    mvalue = reactive("", init=False)
+
     def __init__(self, vector, member):
         self.member = member
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         member_id = self.app.itemid.set_id(vector.name, member.name)
         super().__init__(id=member_id)
 
+    def on_mount(self):
+        self.app.registry.add_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
+    def on_unmount(self):
+        self.app.registry.remove_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
 
     def compose(self):
         "Draw the member"
+        self.set_reactive(TextMemberPane.mvalue, self.member.membervalue)
         if self.vector.perm == "ro":
             yield ROTextLabel(self.member.label)
             yield TextValue(self.member.membervalue)
@@ -114,10 +124,16 @@ class TextMemberPane(Widget):
         yield TextLabel(self.member.label)
         yield ShowText(self.member)
 
+    def watch_mvalue(self, mvalue):
+        try:
+            showtextvalue = self.query_one(TextValue)
+        except NoMatches:
+            # presumably this member has not been displayed yet
+            return
+        showtextvalue.update(mvalue)
 
     def on_text_member_pane_set_value(self, message: SetValue) -> None:
-        showtextvalue = self.query_one(TextValue)
-        showtextvalue.update(message.value)
+        self.mvalue = message.value
 
     def on_button_pressed(self, event):
         "Clear text input field"
@@ -231,9 +247,16 @@ class LightMemberPane(Widget):
     def __init__(self, vector, member):
         self.member = member
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         member_id = self.app.itemid.set_id(vector.name, member.name)
         super().__init__(id=member_id)
 
+    def on_mount(self):
+        self.app.registry.add_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
+    def on_unmount(self):
+        self.app.registry.remove_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
 
     def compose(self):
         "Draw the member"
@@ -306,9 +329,16 @@ class NumberMemberPane(Widget):
     def __init__(self, vector, member):
         self.member = member
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         member_id = self.app.itemid.set_id(vector.name, member.name)
         super().__init__(id=member_id)
 
+    def on_mount(self):
+        self.app.registry.add_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
+    def on_unmount(self):
+        self.app.registry.remove_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
 
     def compose(self):
         "Draw the member"
@@ -437,6 +467,10 @@ class BlobMemberPane(Widget):
             height: auto;
             }
 
+        BlobMemberPane ProgressBar {
+            display: none;
+            }
+
         Button {
             margin: 1;
             width: auto;
@@ -455,9 +489,16 @@ class BlobMemberPane(Widget):
     def __init__(self, vector, member):
         self.member = member
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         member_id = self.app.itemid.set_id(vector.name, member.name)
         super().__init__(id=member_id)
 
+    def on_mount(self):
+        self.app.registry.add_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
+    def on_unmount(self):
+        self.app.registry.remove_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
 
     def compose(self):
         "Draw the member"
@@ -473,33 +514,83 @@ class BlobMemberPane(Widget):
                 yield BLOBRxValue("RX data: -- Nothing yet received --").data_bind(BlobMemberPane.mvalue)
             else:
                 yield BLOBRxValue(f"RX data: {self.member.filename}").data_bind(BlobMemberPane.mvalue)
+            # shown while a BLOB is being received and saved
+            yield ProgressBar(show_eta=False, classes="rxprogress")
+            iclient = self.app.get_client(self.serverid)
             if self.vector.perm == "ro":
                 yield BLOBTxValue("TX data: N/A -- Read only --")
+            elif (iclient is not None) and iclient.sending_blobfile(self.vector, self.member.name):
+                # a file is being sent, its progress will be shown as it is sent
+                yield BLOBTxValue("TX data: -- Sending --")
+                yield ProgressBar(show_eta=False, classes="txprogress")
+                yield Button("Cancel")
             elif last_filename:
                 yield BLOBTxValue(f"TX data: {last_filename}")
+                yield ProgressBar(show_eta=False, classes="txprogress")
                 yield Button("Send File")
             else:
                 yield BLOBTxValue("TX data: -- No file sent --")
+                yield ProgressBar(show_eta=False, classes="txprogress")
                 yield Button("Send File")
 
 
     def on_blob_member_pane_set_value(self, message: SetValue) -> None:
         self.mvalue = message.value
 
+    def watch_mvalue(self, mvalue):
+        "A new file has been received, so any progress bar is complete"
+        if mvalue:
+            try:
+                self.query_one(".rxprogress").display = False
+            except NoMatches:
+                pass
 
-    async def on_button_pressed(self, event):
-        "Open file chooser screen"
-        async def send_path(path):
+    def show_progress(self, done, total):
+        "Show the progress of a BLOB being saved"
+        try:
+            progressbar = self.query_one(".rxprogress")
+        except NoMatches:
+            return
+        progressbar.display = done < total
+        progressbar.update(total=total, progress=done)
+
+
+    def on_button_pressed(self, event):
+        "Open file chooser screen, or if a file is being sent, cancel it"
+        event.stop()
+        iclient = self.app.get_client(self.serverid)
+        if iclient is None:
+            return
+        if iclient.cancel_blobfile(self.vector, self.member.name):
+            return
+        def send_path(path):
             if path is not None:
-                # memberdict of {membername:(value, blobsize, blobformat)}
-                await self.vector.send_newBLOBVector(members={self.member.name:(path, 0, "")})
-                self.member.user_string = path.name
-                path_text = self.query_one(BLOBTxValue)
-                path_text.update(f"TX data: {path.name}")
-                # set state to busy
-                self.parent.parent.vstate = "Busy"
+                iclient.start_blobfile(self.vector, self.member.name, path)
         self.app.push_screen(ChooseFileSc(), send_path)
-        event.stop()
+
+    def show_sending(self, filename, sent, total, seconds):
+        "Show the progress of a file being sent, the Send File button becomes a Cancel button"
+        try:
+            progressbar = self.query_one(".txprogress")
+            self.query_one(Button).label = "Cancel"
+        except NoMatches:
+            return
+        progressbar.display = True
+        progressbar.update(total=total, progress=sent)
+        rate = sent / seconds / 1048576 if seconds else 0
+        self.query_one(BLOBTxValue).update(f"TX data: {filename} {rate:.1f} MB/s")
+
+    def show_sent(self, filename, result=""):
+        "Show the file sent, with result being any failure"
+        try:
+            self.query_one(".txprogress").display = False
+            self.query_one(Button).label = "Send File"
+        except NoMatches:
+            return
+        if result:
+            self.query_one(BLOBTxValue).update(f"TX data: {filename} {result}")
+        else:
+            self.query_one(BLOBTxValue).update(f"TX data: {filename}")
 
 
 
@@ -571,9 +662,16 @@ class SwitchMemberPane(Widget):
     def __init__(self, vector, member):
         self.member = member
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         member_id = self.app.itemid.set_id(vector.name, member.name)
         super().__init__(id=member_id)
 
+    def on_mount(self):
+        self.app.registry.add_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
+    def on_unmount(self):
+        self.app.registry.remove_pane(self, self.serverid, self.vector.devicename, self.vector.name, self.member.name)
+
 
     def compose(self):
         "Draw the member"
@@ -621,6 +719,9 @@ class SwitchMemberPane(Widget):
 
 
 class RadioMembers(Container):
+    """Shows the members of a OneOfMany switch vector as a RadioSet, or if the vector
+       has more than app.maxradio members, as a single Select widget. As values are
+       received, update_values changes only the buttons whose value has changed."""
 
     DEFAULT_CSS = """
         RadioMembers > RadioSet {
@@ -629,29 +730,87 @@ class RadioMembers(Container):
         RadioMembers > RadioSet > RadioButton {
             margin: 1;
             }
+        RadioMembers > Select {
+            width: 60;
+            }
         """
 
-    class ResetValue(Message):
-        pass
-
-
-    # this boolean value is toggled to initiate a recompose
-    mvalue = reactive(False, recompose=True)
-
-    def __init__(self, members):
-        self.members = members
+    def __init__(self, vector):
+        self.vector = vector
+        # membername to the value currently drawn
+        self.drawn = {}
         super().__init__()
 
+    @property
+    def compact(self):
+        return len(self.vector) > self.app.maxradio
+
     def compose(self):
         "Draw the radio buttons"
+        members = self.vector.members()
+        self.drawn = { membername:member.membervalue for membername, member in members.items() }
+        if self.compact:
+            options = [ (member.label, membername) for membername, member in members.items() ]
+            chosen = [ membername for membername, member in members.items() if member.membervalue == "On" ]
+            # the value is only given if a member is On, as the value of a blank Select
+            # is Select.BLANK before textual 8, and Select.NULL from textual 8
+            if chosen:
+                yield Select(options, prompt="None", value=chosen[-1])
+            else:
+                yield Select(options, prompt="None")
+            return
         with RadioSet():
-            for member in self.members.values():
+            for member in members.values():
                 if member.membervalue == "On":
-                    chosenlabel = Text.from_markup(f"{member.label} :green_circle:")
-                    yield RadioButton(chosenlabel, value=True)
+                    yield RadioButton(self.radiolabel(member), value=True)
                 else:
-                    yield RadioButton(member.label)
-
-    def on_radio_members_reset_value(self, message: ResetValue) -> None:
-        # Toggle mvalue to cause a recompose of the RadioMembers
-        self.mvalue = not self.mvalue
+                    yield RadioButton(self.radiolabel(member))
+
+    def radiolabel(self, member):
+        if member.membervalue == "On":
+            return Text.from_markup(f"{member.label} :green_circle:")
+        return member.label
+
+    def update_values(self):
+        "Show the current member values, changing only those which differ from the values drawn"
+        members = self.vector.members()
+        if list(members) != list(self.drawn):
+            # the vector has been redefined with different members, or in a different order
+            self.refresh(recompose=True)
+            return
+        changed = [ membername for membername, member in members.items() if self.drawn[membername] != member.membervalue ]
+        if not changed:
+            return
+        try:
+            if self.compact:
+                select = self.query_one(Select)
+                for membername in changed:
+                    if members[membername].membervalue == "On":
+                        select.value = membername
+                    elif select.value == membername:
+                        select.clear()
+            elif not any(member.membervalue == "On" for member in members.values()):
+                # a RadioSet does not allow its pressed button to be released, so redraw
+                self.refresh(recompose=True)
+            else:
+                buttons = self.query_one(RadioSet).query(RadioButton)
+                for button, (membername, member) in zip(buttons, members.items()):
+                    if membername not in changed:
+                        continue
+                    button.label = self.radiolabel(member)
+                    button.value = (member.membervalue == "On")
+        except NoMatches:
+            # not yet composed, compose will draw the current values
+            return
+        for membername in changed:
+            self.drawn[membername] = members[membername].membervalue
+
+    def chosen(self):
+        "Return the name of the member chosen by the user, or None if no member is chosen"
+        if self.compact:
+            # the selection is None if the Select is blank
+            return self.query_one(Select).selection
+        pressed_index = self.query_one(RadioSet).pressed_index
+        for idx, membername in enumerate(self.vector.members()):
+            if idx == pressed_index:
+                return membername
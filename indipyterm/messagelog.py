@@ -0,0 +1,27 @@
+
+from textual.widgets import Log
+
+
+class MessageLog(Log):
+    """A Log holding at most capacity lines. As the capacity is exceeded the Log
+       removes the oldest lines, and the scroll position is moved up with them,
+       keeping the lines being viewed in place."""
+
+    def __init__(self, capacity=200, **kwargs):
+        super().__init__(max_lines=capacity, **kwargs)
+
+    @property
+    def capacity(self):
+        return self.max_lines
+
+    def write_lines(self, lines, scroll_end=None):
+        "Write the lines, moving the scroll position up by the number of old lines removed"
+        lines = [part for line in lines for part in line.splitlines()]
+        before = self.line_count
+        # the Log scrolls to the end again if it was at the end, and scrolls automatically
+        follows = self.is_vertical_scroll_end and (self.auto_scroll if scroll_end is None else scroll_end)
+        super().write_lines(lines, scroll_end)
+        removed = before + len(lines) - self.line_count
+        if (removed > 0) and self.scroll_y and not follows:
+            self.scroll_to(y=max(0, self.scroll_y - removed), animate=False, immediate=True)
+        return self
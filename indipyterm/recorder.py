@@ -0,0 +1,214 @@
+
+import asyncio, gzip, logging, signal, sys, time
+
+from datetime import datetime, timezone
+
+import xml.etree.ElementTree as ET
+
+import indipyclient as ipc
+
+from indipyclient.ipyclient import _STARTTAGS, _ENDTAGS
+
+from .iclient import BLOBPolicy
+
+
+logger = logging.getLogger()
+logger.addHandler(logging.NullHandler())
+
+
+# seconds between flushes of the recording to the file
+FLUSH_INTERVAL = 1.0
+
+# size of the write buffer
+BUFFERSIZE = 1048576
+
+
+def open_recording(path, mode):
+    "Open the recording file in binary mode, compressed with gzip if the path ends in .gz"
+    if str(path).endswith(".gz"):
+        # a low compression level, as the recording must keep up with the data received
+        return gzip.open(path, mode, compresslevel=1)
+    return open(path, mode, buffering=BUFFERSIZE)
+
+
+def read_recording(path):
+    """Generator which reads a recording, and yields (seconds, xmlbytes) for each
+       message, seconds being the time received from the start of its session.
+
+       A recording is a sequence of sessions, each starting with a line beginning
+       with #, followed by the messages, each a line of the seconds and length of
+       the message, then the message as received from the server, then a newline.
+       A partly written last message, as left if the recorder was stopped abruptly,
+       is ignored."""
+    with open_recording(path, "rb") as f:
+        try:
+            while True:
+                line = f.readline()
+                if not line:
+                    return
+                if line.startswith(b"#"):
+                    yield None, line[1:].strip()
+                    continue
+                seconds, length = line.split()
+                xmlbytes = f.read(int(length))
+                if len(xmlbytes) < int(length):
+                    return
+                f.read(1)
+                yield float(seconds), xmlbytes
+        except (EOFError, ValueError):
+            # the end of the recording is incomplete
+            return
+
+
+class RecordClient(ipc.IPyClient):
+    """Connects to the INDI server, and writes each message received to a recording.
+       Messages are found in the received data by their start and end tags, and only
+       definitions and deletions are parsed, so the devices are learnt and the
+       connection kept as IPyClient does.
+
+       BLOBs are only requested for devices and vectors given an enableBLOB value of
+       Also or Only in blobpolicy."""
+
+    # the number of bytes read from the connection at a time
+    READSIZE = 65536
+
+    def __init__(self, indihost, indiport, path, blobpolicy=()):
+        super().__init__(indihost=indihost, indiport=indiport)
+        self.path = path
+        self.blobpolicy = BLOBPolicy(blobpolicy)
+        self._file = None
+        self._started = time.monotonic()
+        # the number and total size of messages recorded
+        self.count = 0
+        self.size = 0
+
+    async def _run_rx(self):
+        "Read the received data, and record each message in it"
+        buffer = bytearray()
+        # the end tag of the message at the start of the buffer, None if not yet known
+        endtag = None
+        # the position in the buffer from which to look for the end tag
+        scanned = 0
+        while self.connected and (not self._stop):
+            data = await self._reader.read(self.READSIZE)
+            if not data:
+                raise ConnectionError("Connection closed by the server")
+            self.tx_timer = None
+            self.idle_timer = time.time()
+            buffer += data
+            while True:
+                if endtag is None:
+                    start = buffer.find(b"<")
+                    if start < 0:
+                        buffer.clear()
+                        break
+                    del buffer[:start]
+                    close = buffer.find(b">")
+                    if close < 0:
+                        break
+                    for index, starttag in enumerate(_STARTTAGS):
+                        if buffer.startswith(starttag):
+                            break
+                    else:
+                        # not the start of a message, skip it
+                        del buffer[:1]
+                        continue
+                    if buffer[close-1] == ord("/"):
+                        # a message of a single tag ending in />
+                        end = close + 1
+                    else:
+                        endtag = _ENDTAGS[index]
+                        scanned = close
+                if endtag is not None:
+                    end = buffer.find(endtag, scanned)
+                    if end < 0:
+                        # wait for more data, and continue looking from near the end
+                        scanned = max(scanned, len(buffer) - len(endtag))
+                        break
+                    end += len(endtag)
+                    endtag = None
+                message = bytes(buffer[:end])
+                del buffer[:end]
+                await self._received(message)
+
+    async def _received(self, message):
+        "Record the message, and pass definitions and deletions to the client"
+        self.write(message)
+        if message.startswith((b"<def", b"<delProperty")):
+            try:
+                xmldata = ET.fromstring(message)
+            except ET.ParseError:
+                return
+            await self._rxhandler(xmldata)
+
+    def write(self, xmlbytes):
+        "Append a message to the recording"
+        seconds = time.monotonic() - self._started
+        self._file.write(b"%.3f %d\n" % (seconds, len(xmlbytes)))
+        self._file.write(xmlbytes)
+        self._file.write(b"\n")
+        self.count += 1
+        self.size += len(xmlbytes)
+
+    async def warning(self, message):
+        "Warnings are logged and printed, rather than being recorded"
+        logger.warning(message)
+        print(message, file=sys.stderr)
+
+    async def report(self, message):
+        logger.info(message)
+
+    async def resend_enableBLOB(self, devicename, vectorname=None):
+        "Send the enableBLOB value of blobpolicy, by default Never"
+        device = self.get(devicename)
+        if device is None:
+            return
+        if vectorname:
+            vector = device.get(vectorname)
+            if (vector is None) or (vector.vectortype != "BLOBVector"):
+                return
+            vector._enableBLOB = self.blobpolicy.value(None, devicename, vectorname, default="Never")
+        else:
+            device._enableBLOB = self.blobpolicy.value(None, devicename, default="Never")
+        await super().resend_enableBLOB(devicename, vectorname)
+
+    async def hardware(self):
+        "Flush the recording to the file every FLUSH_INTERVAL seconds"
+        while not self._stop:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self._file.flush()
+
+    async def asyncrun(self):
+        "Open the recording, and run the client until shutdown"
+        with open_recording(self.path, "ab") as f:
+            self._file = f
+            started = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+            f.write(f"# indipyterm recording of {self.indihost}:{self.indiport} started {started.isoformat(sep='T')}\n".encode())
+            self._started = time.monotonic()
+            try:
+                await super().asyncrun()
+            finally:
+                self._file = None
+
+
+async def _record(client):
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, client.shutdown)
+    except (NotImplementedError, AttributeError):
+        # not available on this platform
+        pass
+    await client.asyncrun()
+
+
+def record(host, port, path, blobpolicy=()):
+    """Record the messages received from the server to the file at path, without
+       starting the terminal, until interrupted with Ctrl-C or SIGTERM"""
+    client = RecordClient(host, port, path, blobpolicy)
+    print(f"Recording {host}:{port} to {path}, press Ctrl-C to stop", file=sys.stderr)
+    try:
+        asyncio.run(_record(client))
+    except KeyboardInterrupt:
+        pass
+    print(f"Recorded {client.count} messages, {client.size} bytes", file=sys.stderr)
+    return 0
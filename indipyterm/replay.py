@@ -0,0 +1,109 @@
+
+import asyncio, logging, time
+
+import xml.etree.ElementTree as ET
+
+from indipyclient import events
+
+from .iclient import IClient
+
+from .recorder import read_recording
+
+
+logger = logging.getLogger()
+logger.addHandler(logging.NullHandler())
+
+
+def _readbatch(recording, maxcount=500, maxsize=1048576):
+    """Read up to maxcount messages, or maxsize bytes, from the recording generator,
+       called in a thread. Returns an empty list at the end of the recording"""
+    batch = []
+    size = 0
+    for item in recording:
+        batch.append(item)
+        if item[1] is not None:
+            size += len(item[1])
+        if (len(batch) >= maxcount) or (size >= maxsize):
+            break
+    return batch
+
+
+class ReplayClient(IClient):
+    """Replays a recording made with indipyterm --record, in place of a connection
+       to a server. Each message is passed to _rxhandler, and so to rxevent, as if it
+       had been received, at the time it was received multiplied by 1/speed, or as
+       fast as possible if speed is zero. Data sent, such as new values submitted,
+       is discarded."""
+
+    def __init__(self, path, speed=1.0, **clientdata):
+        super().__init__(indihost="replay", indiport=path.name, **clientdata)
+        self.path = path
+        self.speed = speed
+        self._replaying = False
+        # BLOBs are replayed as recorded, not on a second connection
+        self.blobclient = None
+
+    @property
+    def connected(self):
+        return self._replaying
+
+    async def send(self, xmldata):
+        "There is no server, so data sent is discarded"
+        return
+
+    async def _comms(self):
+        "Replay the recording, and then wait until shutdown"
+        loop = asyncio.get_running_loop()
+        self._replaying = True
+        self.clear()
+        self.messages.clear()
+        try:
+            await self.warning(f"Replaying {self.path} at {'maximum speed' if not self.speed else f'{self.speed:g}x speed'}")
+            await self.rxevent(events.ConnectionMade())
+            recording = read_recording(self.path)
+            start = time.monotonic()
+            # seconds of the previous sessions in the recording
+            offset = 0.0
+            seconds = 0.0
+            count = 0
+            while not self._stop:
+                batch = await loop.run_in_executor(None, _readbatch, recording)
+                if not batch:
+                    break
+                for received, xmlbytes in batch:
+                    if self._stop:
+                        break
+                    if received is None:
+                        # the header of a new session, which continues from the last
+                        offset += seconds
+                        seconds = 0.0
+                        continue
+                    seconds = received
+                    if self.speed:
+                        wait = start + (offset + seconds) / self.speed - time.monotonic()
+                        await asyncio.sleep(max(wait, 0))
+                    else:
+                        # let the display be updated
+                        await asyncio.sleep(0)
+                    try:
+                        xmldata = ET.fromstring(xmlbytes)
+                    except ET.ParseError:
+                        logger.warning("Unable to parse a message of the recording")
+                        continue
+                    count += 1
+                    await self._rxhandler(xmldata)
+            elapsed = time.monotonic() - start
+            if not self._stop:
+                await self.warning(f"Replay finished, {count} messages in {elapsed:.1f}s, {count/elapsed if elapsed else 0:.0f} per second")
+            while not self._stop:
+                await asyncio.sleep(0.5)
+        except OSError:
+            await self.warning(f"Unable to read {self.path}")
+            while not self._stop:
+                await asyncio.sleep(0.5)
+        except Exception:
+            logger.exception("Exception report from ReplayClient._comms method")
+            raise
+        finally:
+            self._replaying = False
+            self.shutdown()
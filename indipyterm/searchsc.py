@@ -0,0 +1,99 @@
+from rich.text import Text
+
+from textual import on
+from textual.app import ComposeResult
+from textual.widgets import Input, OptionList
+from textual.widgets.option_list import Option
+from textual.screen import ModalScreen
+from textual.containers import Container
+
+
+class SearchPane(Container):
+
+    DEFAULT_CSS = """
+
+        SearchPane {
+            width: 80%;
+            height: 70%;
+            border: mediumvioletred;
+            background: $panel;
+           }
+
+        SearchPane > OptionList {
+            height: 1fr;
+            margin-top: 1;
+           }
+        """
+
+    def compose(self) -> ComposeResult:
+        yield Input(placeholder="Device, group, vector or member name", id="search")
+        yield OptionList(id="results")
+
+    def on_mount(self):
+        self.border_title = "Find Vector"
+        self.border_subtitle = "Enter to show, Esc to cancel"
+
+
+class SearchSc(ModalScreen):
+    """Searches the names and labels of devices, groups, vectors and members in
+       app.searchindex as each character is typed, and is dismissed with the
+       (serverid, devicename, vectorname) of the result chosen, or None if cancelled."""
+
+    DEFAULT_CSS = """
+
+        SearchSc {
+            align: center middle;
+            }
+        """
+
+    BINDINGS = [("escape", "cancel", "Cancel"), ("down", "cursor_down"), ("up", "cursor_up")]
+
+    def __init__(self):
+        # the (serverid, devicename, vectorname) of each option shown
+        self.results = []
+        super().__init__()
+
+    def compose(self) -> ComposeResult:
+        yield SearchPane()
+
+    @on(Input.Changed, "#search")
+    def search_changed(self, event):
+        event.stop()
+        results = self.app.searchindex.search(event.value)
+        self.results = [result[:3] for result in results]
+        # with more than one server, the server of each device is shown
+        servers = {}
+        if len(self.app.indiclients) > 1:
+            servers = {iclient.clientdata['serverid']: f" on {iclient.indihost}:{iclient.indiport}" for iclient in self.app.indiclients}
+        options = []
+        for serverid, devicename, vectorname, group, label, memberlabel in results:
+            prompt = Text.assemble((label, "bold"), f"  ({vectorname})  ", (f"{devicename}{servers.get(serverid, '')} / {group}", "dim"))
+            if memberlabel:
+                prompt.append(f"  {memberlabel}", style="italic")
+            options.append(Option(prompt))
+        optionlist = self.query_one("#results", OptionList)
+        optionlist.clear_options()
+        optionlist.add_options(options)
+        if options:
+            optionlist.highlighted = 0
+
+    @on(Input.Submitted, "#search")
+    def search_submitted(self, event):
+        event.stop()
+        highlighted = self.query_one("#results", OptionList).highlighted
+        if highlighted is not None:
+            self.dismiss(self.results[highlighted])
+
+    @on(OptionList.OptionSelected, "#results")
+    def option_selected(self, event):
+        event.stop()
+        self.dismiss(self.results[event.option_index])
+
+    def action_cursor_down(self):
+        self.query_one("#results", OptionList).action_cursor_down()
+
+    def action_cursor_up(self):
+        self.query_one("#results", OptionList).action_cursor_up()
+
+    def action_cancel(self):
+        self.dismiss(None)
@@ -0,0 +1,147 @@
+
+import time
+
+from textual.app import ComposeResult
+from textual.widgets import Footer, Static
+from textual.screen import Screen
+from textual.containers import VerticalScroll
+
+
+# event types always shown, even if none have been received
+EVENTTYPES = ("Define", "DefineBLOB", "Set", "SetBLOB", "Message", "Delete", "TimeOut")
+
+
+def _duration(seconds):
+    "Return a short string of a duration"
+    if seconds < 0.001:
+        return f"{seconds*1000000:.0f}us"
+    if seconds < 1:
+        return f"{seconds*1000:.0f}ms"
+    return f"{seconds:.1f}s"
+
+
+def _queued(node):
+    """Return the number of messages queued for a textual message pump, or None if
+       this is not available, as the queue is private to textual and may change"""
+    queue = getattr(node, "_message_queue", None)
+    qsize = getattr(queue, "qsize", None)
+    if qsize is None:
+        return None
+    return qsize()
+
+
+class StatsSc(Screen):
+    """Shows counters of the events handled and the state of the app,
+       refreshed every second"""
+
+    DEFAULT_CSS = """
+
+        StatsSc > #title {
+           background: $primary;
+           color: $text;
+           padding-left: 2;
+           dock: top;
+           }
+
+        StatsSc > VerticalScroll {
+           border: dodgerblue;
+           background: $panel;
+           }
+
+        StatsSc #stats {
+           padding-left: 1;
+           }
+        """
+
+    ENABLE_COMMAND_PALETTE = False
+
+    BINDINGS = [("m", "main", "Return"), ("r", "reset", "Reset counters")]
+
+    def __init__(self):
+        # the event counts at the last refresh, used to calculate rates
+        self.lastcounts = {}
+        self.lasttime = time.monotonic()
+        super().__init__()
+
+    def compose(self) -> ComposeResult:
+        yield Static("Statistics", id="title")
+        with VerticalScroll():
+            yield Static(id="stats", markup=False)
+        yield Footer()
+
+    def on_mount(self):
+        self.query_one(VerticalScroll).border_title = "Events and Widgets"
+        self.lastcounts = dict(self.app.eventstats.counts)
+        self.update_stats()
+        self.set_interval(1, self.update_stats)
+
+    def widget_counts(self):
+        """Return the number of mounted widgets, and the number of messages queued for them,
+           or None for the messages if this is not available"""
+        app = self.app
+        screens = list(app.screen_stack)
+        # cached device screens are not on the stack when hidden, but still receive messages
+        for devicesc in app.devicescreens:
+            if devicesc not in screens:
+                screens.append(devicesc)
+        widgets = 0
+        queued = _queued(app)
+        for screen in screens:
+            for node in screen.walk_children(with_self=True):
+                widgets += 1
+                if queued is not None:
+                    count = _queued(node)
+                    queued = None if count is None else queued + count
+        return widgets, queued
+
+    def update_stats(self):
+        app = self.app
+        stats = app.eventstats
+        now = time.monotonic()
+        interval = now - self.lasttime
+        lines = [f"{'Event':<24}{'Count':>10}{'Per second':>12}"]
+        eventtypes = list(EVENTTYPES) + [ eventtype for eventtype in stats.counts if eventtype not in EVENTTYPES ]
+        for eventtype in eventtypes:
+            count = stats.counts.get(eventtype, 0)
+            rate = (count - self.lastcounts.get(eventtype, 0)) / interval if interval else 0
+            lines.append(f"{eventtype:<24}{count:>10}{rate:>12.1f}")
+        lines.append(f"{'Total':<24}{stats.total:>10}")
+        lines.append("")
+        if stats.total:
+            lines.append(f"Time in rxevent, mean {_duration(stats.totaltime/stats.total)}, maximum {_duration(stats.maxtime)}, "
+                         f"total {_duration(stats.totaltime)} over {_duration(now-stats.started)}")
+            biggest = max(stats.histogram)
+            lower = "0"
+            for limit, count in zip(stats.BINS + (None,), stats.histogram):
+                if limit is None:
+                    label = f"{'>= ' + lower:<24}"
+                else:
+                    label = f"{lower + ' - ' + _duration(limit):<24}"
+                    lower = _duration(limit)
+                bar = "#" * round(30 * count / biggest)
+                lines.append(f"{label}{count:>10}  {bar}")
+        else:
+            lines.append("No events received")
+        lines.append("")
+        widgets, queued = self.widget_counts()
+        lines.append(f"{'Mounted widgets':<24}{widgets:>10}")
+        if queued is None:
+            queued = "n/a"
+        lines.append(f"{'Queued messages':<24}{queued:>10}")
+        lines.append(f"{'Cached device screens':<24}{len(app.devicescreens):>10}")
+        lines.append(f"{'Registered widgets':<24}{len(app.registry):>10}")
+        lines.append(f"{'Pending vector updates':<24}{len(app.renderer):>10}")
+        lines.append(f"{'ItemID size':<24}{len(app.itemid):>10}")
+        self.query_one("#stats").update("\n".join(lines))
+        self.lastcounts = dict(stats.counts)
+        self.lasttime = now
+
+    def action_main(self) -> None:
+        """Event handler called when m pressed."""
+        self.app.pop_screen()
+
+    def action_reset(self) -> None:
+        """Event handler called when r pressed."""
+        self.app.eventstats.clear()
+        self.lastcounts = {}
+        self.update_stats()
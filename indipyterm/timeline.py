@@ -0,0 +1,33 @@
+
+import time
+
+
+class Timeline():
+    """Records the time at which named points of the startup are first reached,
+       such as the first paint of the screen and the first definition received.
+       Times are from the import of this module, which is one of the first made,
+       and nothing is recorded unless enabled, so marks cost little otherwise."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.enabled = False
+        # name to time reached, in the order reached
+        self._marks = {}
+
+    def mark(self, name):
+        "Record the time this point is reached, if enabled, and not already reached"
+        if self.enabled and (name not in self._marks):
+            self._marks[name] = time.perf_counter()
+
+    def lines(self):
+        "Return a list of lines giving the time of each point, and the time since the previous one"
+        lines = []
+        previous = self.start
+        for name, reached in self._marks.items():
+            lines.append(f"{(reached - self.start)*1000:9.1f} ms {(reached - previous)*1000:+9.1f} ms  {name}")
+            previous = reached
+        return lines
+
+
+# the timeline of this process
+timeline = Timeline()
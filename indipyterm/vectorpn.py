@@ -1,12 +1,12 @@
 
 
-from textual.widgets import Static, Button, Switch, RadioSet
+from textual.widgets import Static, Button, Switch, Select
 from textual.reactive import reactive
 from textual.containers import Container
 from textual.widget import Widget
 from textual.message import Message
 
-from .iclient import localtimestring
+from .iclient import localtimestring, displayvalue, vector_signature
 
 from .memberpn import SwitchMemberPane, TextMemberPane, LightMemberPane, NumberMemberPane, BlobMemberPane, NumberInputField, TextInputField, RadioMembers
 
@@ -111,6 +111,11 @@ class VectorPane(Widget):
             background: $panel;
             border: mediumvioletred;
             }
+
+        VectorPane.stale {
+            border: $panel-lighten-3;
+            text-opacity: 60%;
+            }
         """
 
     vtime = reactive("")
@@ -148,6 +153,10 @@ class VectorPane(Widget):
     def __init__(self, vector):
         "This VectorPane has attribute self.vector and id of the vectorid"
         self.vector = vector
+        # the serverid of the client of the vector, as its device is the device shown
+        self.serverid = self.app.itemid.serverid
+        # the attributes of the vector this pane is drawn from
+        self.signature = vector_signature(vector)
         vectorid = self.app.itemid.set_id(vector.name)
         super().__init__(id=vectorid)
 
@@ -185,6 +194,35 @@ class VectorPane(Widget):
             yield BLOBVector(self.vector)
 
 
+    def resync(self):
+        "Show the current vector values"
+        self.vtime = localtimestring(self.vector.timestamp)
+        self.vstate = self.vector.state
+        if self.vector.message:
+            self.vmessage = localtimestring(self.vector.message_timestamp) + "  " + self.vector.message
+        if self.vector.vectortype == "SwitchVector" and self.vector.rule == "OneOfMany":
+            self.query_one(RadioMembers).update_values()
+            return
+        for membername in self.vector:
+            memberpane = self.app.registry.get_pane(self.serverid, self.vector.devicename, self.vector.name, membername)
+            if memberpane is not None:
+                memberpane.mvalue = displayvalue(self.vector, membername)
+
+    def set_busy(self):
+        "Show the vector as Busy, as new values have been submitted"
+        self.vstate = "Busy"
+        # the next state received should be shown, even if it is the same as the last
+        self.app.renderer.forget(self.serverid, self.vector.devicename, self.vector.name, "vstate")
+
+    def on_mount(self):
+        self.app.registry.add_pane(self, self.serverid, self.vector.devicename, self.vector.name)
+        iclient = self.app.get_client(self.serverid)
+        if iclient is not None:
+            self.set_class(iclient.is_stale(self.vector.devicename, self.vector.name), "stale")
+
+    def on_unmount(self):
+        self.app.registry.remove_pane(self, self.serverid, self.vector.devicename, self.vector.name)
+
     def on_vector_pane_show_timestamp(self, message: ShowTimestamp) -> None:
         self.vtime = message.timestamp
 
@@ -201,13 +239,28 @@ class VectorPane(Widget):
             # in vector message space
             self.vmessage = message.sbmessage
             return
-        vectorid = self.app.itemid.get_id(self.vector.name)
-        buttonstatus = self.query_one(f"#{vectorid}_submitmessage")
-        buttonstatus.update(message.sbmessage)
+        buttonstatus = self.app.registry.get_submit(self.serverid, self.vector.devicename, self.vector.name)
+        if buttonstatus is not None:
+            buttonstatus.update(message.sbmessage)
 
 
 
 
+class SubmitMessage(Static):
+    "Shows any buttonstatus message required on an update being submitted"
+
+    def __init__(self, vector):
+        self.vector = vector
+        self.serverid = self.app.itemid.serverid
+        super().__init__("")
+
+    def on_mount(self):
+        self.app.registry.add_submit(self, self.serverid, self.vector.devicename, self.vector.name)
+
+    def on_unmount(self):
+        self.app.registry.remove_submit(self, self.serverid, self.vector.devicename, self.vector.name)
+
+
 class SwitchVector(Widget):
 
     DEFAULT_CSS = """
@@ -232,6 +285,7 @@ class SwitchVector(Widget):
 
     def __init__(self, vector):
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         super().__init__()
 
     def compose(self):
@@ -247,8 +301,8 @@ class SwitchVector(Widget):
             with Container(classes="submitbutton"):
                 # create a static string with submit button
                 # the string will hold any buttonstatus message required on an update being
-                # submitted and will have id vectorid_submitmessage
-                yield Static("", id=f"{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+                # submitted and is found from the app registry
+                yield SubmitMessage(self.vector)
                 yield Button("Submit")
 
 
@@ -258,7 +312,7 @@ class SwitchVector(Widget):
             # ignore switch changes for read only vectors
             return
         # clear buttonstatus message
-        buttonstatus = self.query_one(f"#{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+        buttonstatus = self.app.registry.get_submit(self.serverid, self.vector.devicename, self.vector.name)
         buttonstatus.update("")
         if self.vector.rule == "AnyOfMany":
             # No need to enforce this
@@ -281,7 +335,7 @@ class SwitchVector(Widget):
         if self.vector.perm == "ro":
             # No submission for read only vectors
             return
-        buttonstatus = self.query_one(f"#{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+        buttonstatus = self.app.registry.get_submit(self.serverid, self.vector.devicename, self.vector.name)
         switchpanes = self.query(SwitchMemberPane)
         memberdict = {}
         for sp in switchpanes:
@@ -306,7 +360,7 @@ class SwitchVector(Widget):
         # send this to the server
         buttonstatus.update("")
         # set state to busy
-        self.parent.vstate = "Busy"
+        self.parent.set_busy()
         await self.vector.send_newSwitchVector(members=memberdict)
 
 
@@ -340,12 +394,13 @@ class RadioVector(Widget):
 
     def __init__(self, vector):
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         super().__init__()
 
     def compose(self):
         "Draw the radio buttons"
         # draw a radio button for each vector member
-        yield RadioMembers( self.vector.members() )
+        yield RadioMembers(self.vector)
 
         # After the switches, for rw or wo vectors, create a submit button
 
@@ -353,8 +408,8 @@ class RadioVector(Widget):
             with Container(classes="submitbutton"):
                 # create a static string with submit button
                 # the string will hold any buttonstatus message required on an update being
-                # submitted and will have id vectorid_submitmessage
-                yield Static("", id=f"{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+                # submitted and is found from the app registry
+                yield SubmitMessage(self.vector)
                 yield Button("Submit")
 
 
@@ -363,20 +418,18 @@ class RadioVector(Widget):
         if self.vector.perm == "ro":
             # No submission for read only vectors
             return
-        buttonstatus = self.query_one(f"#{self.app.itemid.get_id(self.vector.name)}_submitmessage")
-        radiobtns = self.query_one(RadioSet)
-        pressed_index = radiobtns.pressed_index
+        buttonstatus = self.app.registry.get_submit(self.serverid, self.vector.devicename, self.vector.name)
+        chosen = self.query_one(RadioMembers).chosen()
         memberdict = {}
-        members = self.vector.members()
-        for idx, membername in enumerate(members.keys()):
-            if idx == pressed_index:
+        for membername in self.vector:
+            if membername == chosen:
                 memberdict[membername] = "On"
             else:
                 memberdict[membername] = "Off"
         # send this to the server
         buttonstatus.update("")
         # set state to busy
-        self.parent.vstate = "Busy"
+        self.parent.set_busy()
         await self.vector.send_newSwitchVector(members=memberdict)
 
 
@@ -406,6 +459,7 @@ class TextVector(Widget):
 
     def __init__(self, vector):
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         super().__init__()
 
     def compose(self):
@@ -416,7 +470,7 @@ class TextVector(Widget):
 
         if self.vector.perm != "ro":
             with Container(classes="submitbutton"):
-                yield Static("", id=f"{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+                yield SubmitMessage(self.vector)
                 yield Button("Submit")
 
     async def on_button_pressed(self, event):
@@ -424,7 +478,7 @@ class TextVector(Widget):
         if self.vector.perm == "ro":
             # No submission for read only vectors
             return
-        buttonstatus = self.query_one(f"#{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+        buttonstatus = self.app.registry.get_submit(self.serverid, self.vector.devicename, self.vector.name)
         textpanes = self.query(TextMemberPane)
         memberdict = {}
         for tp in textpanes:
@@ -436,7 +490,7 @@ class TextVector(Widget):
         # send this to the server
         buttonstatus.update("")
         # set state to busy
-        self.parent.vstate = "Busy"
+        self.parent.set_busy()
         await self.vector.send_newTextVector(members=memberdict)
 
 
@@ -485,6 +539,7 @@ class NumberVector(Widget):
 
     def __init__(self, vector):
         self.vector = vector
+        self.serverid = self.app.itemid.serverid
         super().__init__()
 
     def compose(self):
@@ -495,7 +550,7 @@ class NumberVector(Widget):
 
         if self.vector.perm != "ro":
             with Container(classes="submitbutton"):
-                yield Static("", id=f"{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+                yield SubmitMessage(self.vector)
                 yield Button("Submit")
 
     async def on_button_pressed(self, event):
@@ -503,7 +558,7 @@ class NumberVector(Widget):
         if self.vector.perm == "ro":
             # No submission for read only vectors
             return
-        buttonstatus = self.query_one(f"#{self.app.itemid.get_id(self.vector.name)}_submitmessage")
+        buttonstatus = self.app.registry.get_submit(self.serverid, self.vector.devicename, self.vector.name)
         numberpanes = self.query(NumberMemberPane)
         memberdict = {}
         for np in numberpanes:
@@ -515,17 +570,61 @@ class NumberVector(Widget):
         # send this to the server
         buttonstatus.update("")
         # set state to busy
-        self.parent.vstate = "Busy"
+        self.parent.set_busy()
         await self.vector.send_newNumberVector(members=memberdict)
 
 
 
+class BLOBPolicySelect(Select):
+    """Chooses the enableBLOB value of a BLOB vector, Default takes the value
+       chosen for the device"""
+
+    OPTIONS = [("Device default", "Default"),
+               ("Never", "Never"),
+               ("Also", "Also"),
+               ("Only, no other values", "Only")]
+
+    def __init__(self, vector):
+        self.vector = vector
+        self.serverid = self.app.itemid.serverid
+        value = self.app.blobpolicy.get(self.serverid, vector.devicename, vector.name) or "Default"
+        super().__init__(self.OPTIONS, allow_blank=False, value=value, compact=True)
+
+    async def on_select_changed(self, event):
+        event.stop()
+        value = None if event.value == "Default" else event.value
+        if value == self.app.blobpolicy.get(self.serverid, self.vector.devicename, self.vector.name):
+            return
+        iclient = self.app.get_client(self.serverid)
+        if iclient is None:
+            self.app.blobpolicy.set(value, self.serverid, self.vector.devicename, self.vector.name)
+        else:
+            await iclient.set_blobpolicy(value, self.vector.devicename, self.vector.name)
+        if value is None:
+            # a value given for every server continues to apply
+            value = self.app.blobpolicy.get(self.serverid, self.vector.devicename, self.vector.name)
+            if value is not None:
+                self.value = value
+
+
 class BLOBVector(Widget):
 
     DEFAULT_CSS = """
         BLOBVector {
             height: auto;
             }
+        BLOBVector > .blobpolicy {
+            layout: horizontal;
+            height: auto;
+            margin-left: 1;
+            }
+        BLOBVector > .blobpolicy > Static {
+            width: auto;
+            margin-right: 1;
+            }
+        BLOBVector > .blobpolicy > Select {
+            width: 30;
+            }
         """
 
     def __init__(self, vector):
@@ -534,6 +633,11 @@ class BLOBVector(Widget):
 
     def compose(self):
         "Draw the BLOB vector"
+        if self.vector.perm != "wo":
+            # choose whether the server sends BLOBs of this vector
+            with Container(classes="blobpolicy"):
+                yield Static("Receive BLOBs:")
+                yield BLOBPolicySelect(self.vector)
         members = self.vector.members()
         for member in members.values():
             yield BlobMemberPane(self.vector, member)
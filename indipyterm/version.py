@@ -0,0 +1,4 @@
+
+# kept in a module of its own, so the version can be given without importing textual
+
+version = "0.1.4"